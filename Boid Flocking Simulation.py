@@ -1,9 +1,21 @@
 import pygame
+import os
 import sys
 import math
 import random
+import argparse
+import itertools
+import functools
+import csv
+import json
+from time import perf_counter_ns
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
 from pygame.math import Vector2
 from pygame.locals import *
+from trajectory import TrajectoryReader, TrajectoryWriter
 
 # Constants
 WIDTH = 1280
@@ -22,14 +34,52 @@ PERCEPTION_RADIUS = 80
 SEPARATION_WEIGHT = 1.8
 ALIGNMENT_WEIGHT = 1.2
 COHESION_WEIGHT = 1.0
+TRAIL_LENGTH = 100  # positions kept per boid for "Trace Paths"
+
+# Physics runs at a fixed PHYSICS_RATE ticks per second, independent of the
+# render rate; at most MAX_STEPS_PER_FRAME ticks are caught up per frame
+PHYSICS_RATE = 60
+MAX_STEPS_PER_FRAME = 4
+
+# Adaptive level of detail: when frames take longer than FRAME_BUDGET_MS, boids
+# are drawn as points, trails are subsampled and the UI is redrawn less often
+ADAPTIVE_DETAIL = True
+FRAME_BUDGET_MS = 1000 / FPS
+UI_REFRESH_FRAMES = 10  # frames between UI redraws at the lowest detail
+
+# Profiling: PROFILE shows the per-phase timing overlay, PROFILE_OUTPUT names
+# a .csv or .json file that receives every frame's timings on exit
+PROFILE = False
+PROFILE_OUTPUT = None
+
+# Trajectory recording (see trajectory.py): RECORD_PATH names a directory that
+# receives every physics tick's positions and velocities
+RECORD_PATH = None
+
+# Neighbor search: "grid" uses a spatial hash rebuilt once per frame,
+# "brute" checks every pair and is kept as the reference implementation
+NEIGHBOR_SEARCH = "grid"
+
+# Flock engine: "objects" steps one Boid at a time, "numpy" steps the whole
+# flock as arrays (rules are evaluated from the positions at the start of the
+# tick), "shared" runs the array rules on a worker pool over shared memory
+ENGINE = "numpy"
+WORKERS = os.cpu_count() or 1  # worker processes for the "shared" engine
+
+# Boid outline as (x, y) offsets, shared by both engines
+BOID_SHAPE = [(1, 0), (-0.7, 0.3), (-0.5, 0), (-0.7, -0.3)]
+
+# Boid rendering: "sprites" blits pre-rotated sprites in one call, "polygons"
+# draws each outline with pygame.draw.polygon
+RENDER_MODE = "sprites"
+SPRITE_HEADINGS = 72  # quantized rotations in the sprite cache
 
 class Boid:
-    def __init__(self):
-        self.position = Vector2(random.randint(0, WIDTH), random.randint(0, HEIGHT))
-        angle = random.uniform(0, 2 * math.pi)
+    def __init__(self, rng=random):
+        self.position = Vector2(rng.randint(0, WIDTH), rng.randint(0, HEIGHT))
+        angle = rng.uniform(0, 2 * math.pi)
         self.velocity = Vector2(math.cos(angle), math.sin(angle)) * MAX_SPEED
         self.acceleration = Vector2(0, 0)
-        self.path = []
 
     def edges(self):
         margin = 50
@@ -113,28 +163,547 @@ class Boid:
             self.velocity = self.velocity.normalize() * MAX_SPEED
         self.position += self.velocity
         self.acceleration *= 0
-        self.path.append(self.position.copy())
-        if len(self.path) > 100:
-            self.path.pop(0)
 
     def draw(self, screen):
         angle = math.degrees(math.atan2(-self.velocity.y, self.velocity.x))
-        original_points = [
-            Vector2(1, 0),
-            Vector2(-0.7, 0.3),
-            Vector2(-0.5, 0),
-            Vector2(-0.7, -0.3)
-        ]
+        original_points = [Vector2(p) for p in BOID_SHAPE]
         scaled_points = [p * BOID_SIZE for p in original_points]
         rotated_points = [p.rotate(angle) for p in scaled_points]
         translated_points = [self.position + p for p in rotated_points]
         pygame.draw.polygon(screen, BOID_COLOR, [(p.x, p.y) for p in translated_points])
 
+class SpatialGrid:
+    # Boids update one after another within a frame, so a boid can travel up to
+    # MAX_SPEED after the grid was built. Padding the cell size by that amount
+    # keeps every boid within PERCEPTION_RADIUS inside the 3x3 block of cells.
+    def __init__(self, cell_size=PERCEPTION_RADIUS + MAX_SPEED):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.boids = []
+
+    def cell_of(self, position):
+        return (int(position.x // self.cell_size), int(position.y // self.cell_size))
+
+    def build(self, boids):
+        self.boids = boids
+        self.cells = {}
+        for index, boid in enumerate(boids):
+            self.cells.setdefault(self.cell_of(boid.position), []).append(index)
+
+    def neighbors(self, position):
+        cx, cy = self.cell_of(position)
+        indices = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                indices.extend(self.cells.get((cx + dx, cy + dy), ()))
+        # Visit candidates in list order so the force sums match the brute-force path
+        indices.sort()
+        return [self.boids[i] for i in indices]
+
+def draw_points(surface, positions, color):
+    # Cheapest boid rendering: one 2x2 pixel block per boid, written straight into the surface
+    width, height = surface.get_size()
+    xs = positions[:, 0].astype(np.int64)
+    ys = positions[:, 1].astype(np.int64)
+    inside = (xs >= 0) & (xs < width - 1) & (ys >= 0) & (ys < height - 1)
+    xs, ys = xs[inside], ys[inside]
+    pixels = pygame.surfarray.pixels3d(surface)
+    for dx in (0, 1):
+        for dy in (0, 1):
+            pixels[xs + dx, ys + dy] = color
+    del pixels
+
+class TrailBuffer:
+    # Preallocated (N, length, 2) ring of recent positions with one write head
+    # shared by the whole flock. steps[k] is the largest per-axis move of any
+    # boid into slot k, so drawing knows the longest one-tick segment.
+    def __init__(self, count, length=None):
+        self.points = np.zeros((count, length or TRAIL_LENGTH, 2))
+        self.steps = np.zeros(self.points.shape[1])
+        self.head = 0
+        self.size = 0
+
+    def push(self, positions):
+        length = self.points.shape[1]
+        self.points[:, self.head] = positions
+        if self.size:
+            self.steps[self.head] = np.abs(self.points[:, self.head] - self.points[:, self.head - 1]).max()
+        self.head = (self.head + 1) % length
+        self.size = min(self.size + 1, length)
+
+    def order(self, stride=1):
+        # Ring slots from oldest to newest, optionally keeping every stride-th one
+        length = self.points.shape[1]
+        slots = (self.head - self.size + np.arange(self.size)) % length
+        if stride > 1 and self.size > 1:
+            slots = np.append(slots[:-1:stride], slots[-1])
+        return slots
+
+    def draw(self, surface, color, stride=1):
+        # Rasterize every trail segment straight into the surface pixels. Each
+        # segment gets as many samples as the longest one-tick move needs to
+        # leave no gaps, so the cost is a handful of whole-array operations
+        # regardless of the flock size. A stride joins stride ticks into one
+        # segment with that same sample count, which draws it dotted but cuts
+        # the work by the stride.
+        slots = self.order(stride)
+        if len(slots) < 2:
+            return
+        start = self.points[:, slots[:-1]]
+        delta = self.points[:, slots[1:]] - start
+        samples = int(np.ceil(self.steps[self.order()[1:]].max())) + 1
+        width, height = surface.get_size()
+        pixels = pygame.surfarray.pixels3d(surface)
+        for t in np.linspace(0, 1, samples):
+            xs = (start[..., 0] + delta[..., 0] * t).astype(np.int64).ravel()
+            ys = (start[..., 1] + delta[..., 1] * t).astype(np.int64).ravel()
+            inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+            pixels[xs[inside], ys[inside]] = color
+        del pixels
+
+class BoidFlock:
+    # Object engine: a list of Boid instances stepped one after another
+    def __init__(self, count=NUM_BOIDS, rng=random):
+        self.boids = [Boid(rng) for _ in range(count)]
+        self.grid = SpatialGrid()
+        self.trails = TrailBuffer(count)
+
+    def state(self):
+        positions = np.array([(b.position.x, b.position.y) for b in self.boids])
+        velocities = np.array([(b.velocity.x, b.velocity.y) for b in self.boids])
+        return positions, velocities
+
+    def step(self, separation_weight, alignment_weight, cohesion_weight, profiler=None):
+        if profiler:
+            self.timed_step(separation_weight, alignment_weight, cohesion_weight, profiler)
+            return
+
+        if NEIGHBOR_SEARCH == "grid":
+            self.grid.build(self.boids)
+
+        for boid in self.boids:
+            candidates = self.grid.neighbors(boid.position) if NEIGHBOR_SEARCH == "grid" else self.boids
+            boid.apply_rules(candidates, separation_weight, alignment_weight, cohesion_weight)
+            boid.update()
+            boid.edges()
+        self.trails.push([(boid.position.x, boid.position.y) for boid in self.boids])
+
+    def timed_step(self, separation_weight, alignment_weight, cohesion_weight, profiler):
+        # Same as step, with the per-boid calls charged to their profiler phases
+        if NEIGHBOR_SEARCH == "grid":
+            self.grid.build(self.boids)
+        profiler.lap("apply_rules")
+
+        rules = update = edges = 0
+        for boid in self.boids:
+            start = perf_counter_ns()
+            candidates = self.grid.neighbors(boid.position) if NEIGHBOR_SEARCH == "grid" else self.boids
+            boid.apply_rules(candidates, separation_weight, alignment_weight, cohesion_weight)
+            ruled = perf_counter_ns()
+            boid.update()
+            updated = perf_counter_ns()
+            boid.edges()
+            rules += ruled - start
+            update += updated - ruled
+            edges += perf_counter_ns() - updated
+        self.trails.push([(boid.position.x, boid.position.y) for boid in self.boids])
+
+        profiler.add("apply_rules", rules)
+        profiler.add("update", update)
+        profiler.add("edges", edges)
+        profiler.lap(None)
+
+    def draw(self, screen):
+        if RENDER_MODE == "sprites":
+            draw_sprites(screen, *self.state())
+        else:
+            for boid in self.boids:
+                boid.draw(screen)
+
+    def draw_trails(self, screen, stride=1):
+        self.trails.draw(screen, TRACE_COLOR, stride)
+
+    def close(self):
+        pass
+
+def neighbor_pairs(positions, radius, queries=None):
+    # Cell-list search over an (N, 2) position array. Returns (q, j, diff, dist)
+    # for every pair with 0 <= dist < radius and j != queries[q], where diff is
+    # positions[queries[q]] - positions[j]. For a given query the pairs always
+    # come out in the same order, whichever other queries are in the batch.
+    if queries is None:
+        queries = np.arange(len(positions))
+    cells = np.floor(positions / radius).astype(np.int64)
+    cells -= cells.min(axis=0) - 1
+    rows = cells[:, 1].max() + 2
+    keys = cells[:, 0] * rows + cells[:, 1]
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    query_keys = keys[queries]
+    local = np.arange(len(queries))
+
+    xs = positions[:, 0]
+    ys = positions[:, 1]
+    radius_sq = radius * radius
+    q_parts = []
+    j_parts = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            target = query_keys + dx * rows + dy
+            start = np.searchsorted(sorted_keys, target, "left")
+            counts = np.searchsorted(sorted_keys, target, "right") - start
+            total = counts.sum()
+            if total == 0:
+                continue
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            q = np.repeat(local, counts)
+            j = order[np.repeat(start, counts) + offsets]
+            i = queries[q]
+            dist_sq = (xs[i] - xs[j]) ** 2 + (ys[i] - ys[j]) ** 2
+            keep = (dist_sq < radius_sq) & (i != j)
+            q_parts.append(q[keep])
+            j_parts.append(j[keep])
+
+    if not q_parts:
+        q_parts = j_parts = [np.empty(0, dtype=np.int64)]
+    q = np.concatenate(q_parts)
+    j = np.concatenate(j_parts)
+    i = queries[q]
+    diff = np.column_stack((xs[i] - xs[j], ys[i] - ys[j]))
+    dist = np.hypot(diff[:, 0], diff[:, 1])
+    return q, j, diff, dist
+
+def limit_rows(vectors, limit):
+    # Row-wise version of Boid.limit_force / the speed cap in Boid.update
+    length = np.hypot(vectors[:, 0], vectors[:, 1])
+    scale = np.where(length > limit, limit / np.where(length > 0, length, 1), 1.0)
+    return vectors * scale[:, None]
+
+def steer_towards(desired, active, velocities, weight):
+    # Vectorized "normalize * MAX_SPEED - velocity, limit, weight" used by every rule
+    length = np.hypot(desired[:, 0], desired[:, 1])
+    active = active & (length > 0)
+    desired = desired / np.where(active, length, 1)[:, None] * MAX_SPEED
+    steering = limit_rows(desired - velocities, MAX_FORCE) * weight
+    steering[~active] = 0
+    return steering
+
+def flock_accelerations(positions, velocities, separation_weight, alignment_weight, cohesion_weight, queries=None):
+    # Batched Boid.apply_rules for the boids in queries (all boids by default)
+    if queries is None:
+        queries = np.arange(len(positions))
+    count = len(queries)
+    q, j, diff, dist = neighbor_pairs(positions, PERCEPTION_RADIUS, queries)
+
+    close = (dist < PERCEPTION_RADIUS * 0.3) & (dist > 0)
+    qs = q[close]
+    push = diff[close] / dist[close][:, None]
+    total_sep = np.bincount(qs, minlength=count)
+    separation = np.column_stack((np.bincount(qs, push[:, 0], count), np.bincount(qs, push[:, 1], count)))
+
+    total = np.bincount(q, minlength=count)
+    alignment = np.column_stack((np.bincount(q, velocities[j, 0], count), np.bincount(q, velocities[j, 1], count)))
+    cohesion = np.column_stack((np.bincount(q, positions[j, 0], count), np.bincount(q, positions[j, 1], count)))
+
+    own_velocity = velocities[queries]
+    has_sep = total_sep > 0
+    has_any = total > 0
+    separation /= np.maximum(total_sep, 1)[:, None]
+    alignment /= np.maximum(total, 1)[:, None]
+    cohesion = cohesion / np.maximum(total, 1)[:, None] - positions[queries]
+
+    acceleration = steer_towards(separation, has_sep, own_velocity, separation_weight)
+    acceleration += steer_towards(alignment, has_any, own_velocity, alignment_weight)
+    acceleration += steer_towards(cohesion, has_any, own_velocity, cohesion_weight)
+    return acceleration
+
+def integrate_flock(positions, velocities, accelerations):
+    # Batched Boid.update followed by Boid.edges, in place
+    update_flock(positions, velocities, accelerations)
+    flock_edges(positions, velocities)
+
+def update_flock(positions, velocities, accelerations):
+    velocities += accelerations
+    velocities[:] = limit_rows(velocities, MAX_SPEED)
+    positions += velocities
+
+def flock_edges(positions, velocities):
+    margin = 50
+    turn_factor = 0.2
+    velocities[positions[:, 0] < margin, 0] += turn_factor
+    velocities[positions[:, 0] > WIDTH - margin, 0] -= turn_factor
+    velocities[positions[:, 1] < margin, 1] += turn_factor
+    velocities[positions[:, 1] > HEIGHT - margin, 1] -= turn_factor
+
+def boid_outlines(positions, velocities):
+    # (N, len(BOID_SHAPE), 2) polygon vertices, matching Boid.draw
+    angle = np.arctan2(-velocities[:, 1], velocities[:, 0])
+    cos, sin = np.cos(angle)[:, None], np.sin(angle)[:, None]
+    shape = np.array(BOID_SHAPE) * BOID_SIZE
+    xs = shape[:, 0] * cos - shape[:, 1] * sin + positions[:, 0:1]
+    ys = shape[:, 0] * sin + shape[:, 1] * cos + positions[:, 1:2]
+    return np.stack((xs, ys), axis=-1)
+
+@functools.lru_cache(maxsize=None)
+def boid_sprites():
+    # One boid sprite per quantized heading, built on first use (needs a display)
+    size = 2 * BOID_SIZE + 2
+    center = np.array([size / 2, size / 2])
+    angles = np.arange(SPRITE_HEADINGS) * 2 * math.pi / SPRITE_HEADINGS
+    headings = np.column_stack((np.cos(angles), -np.sin(angles)))
+    sprites = []
+    for outline in boid_outlines(np.tile(center, (SPRITE_HEADINGS, 1)), headings).tolist():
+        sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.polygon(sprite, BOID_COLOR, outline)
+        sprites.append(sprite.convert_alpha())
+    return sprites, size // 2
+
+def draw_sprites(screen, positions, velocities):
+    # Pick the nearest pre-rotated sprite for every boid and blit them all at once
+    sprites, half = boid_sprites()
+    angle = np.arctan2(-velocities[:, 1], velocities[:, 0])
+    index = np.rint(angle * SPRITE_HEADINGS / (2 * math.pi)).astype(np.int64) % SPRITE_HEADINGS
+    corners = (np.rint(positions) - half).astype(np.int64)
+    screen.blits(zip(map(sprites.__getitem__, index.tolist()), corners.tolist()), doreturn=False)
+
+class ArrayFlock:
+    # Structure-of-arrays engine: the flock lives in (N, 2) position and velocity arrays
+    def __init__(self, count=NUM_BOIDS, rng=None):
+        rng = rng if rng is not None else np.random.default_rng()
+        self.positions = np.column_stack((
+            rng.integers(0, WIDTH, count, endpoint=True),
+            rng.integers(0, HEIGHT, count, endpoint=True),
+        )).astype(float)
+        angle = rng.uniform(0, 2 * math.pi, count)
+        self.velocities = np.column_stack((np.cos(angle), np.sin(angle))) * MAX_SPEED
+        self.trails = TrailBuffer(count)
+
+    def state(self):
+        return self.positions, self.velocities
+
+    def step(self, separation_weight, alignment_weight, cohesion_weight, profiler=None):
+        accelerations = flock_accelerations(self.positions, self.velocities,
+                                            separation_weight, alignment_weight, cohesion_weight)
+        if profiler:
+            profiler.lap("apply_rules")
+        update_flock(self.positions, self.velocities, accelerations)
+        self.trails.push(self.positions)
+        if profiler:
+            profiler.lap("update")
+        flock_edges(self.positions, self.velocities)
+        if profiler:
+            profiler.lap("edges")
+
+    def draw(self, screen):
+        if RENDER_MODE == "sprites":
+            draw_sprites(screen, self.positions, self.velocities)
+        else:
+            for outline in boid_outlines(self.positions, self.velocities).tolist():
+                pygame.draw.polygon(screen, BOID_COLOR, outline)
+
+    def draw_trails(self, screen, stride=1):
+        self.trails.draw(screen, TRACE_COLOR, stride)
+
+    def close(self):
+        pass
+
+# Worker-side view of the SharedFlock buffers, attached once per process
+_shared_state = {}
+
+def _attach_shared_flock(name, count):
+    memory = shared_memory.SharedMemory(name=name)
+    _shared_state["memory"] = memory
+    _shared_state["buffers"] = np.ndarray((2, 2, count, 2), buffer=memory.buf)
+
+def _step_shared_region(task):
+    # Advance the boids whose x lies in [low, high) from the read buffer into
+    # the write buffer. Only boids within PERCEPTION_RADIUS of the strip are
+    # handed to the neighbour search; they keep their flock order, so each
+    # boid sees its neighbours in the same order whatever the partitioning.
+    read, low, high, weights = task
+    buffers = _shared_state["buffers"]
+    positions, velocities = buffers[read]
+    x = positions[:, 0]
+    nearby = np.flatnonzero((x >= low - PERCEPTION_RADIUS) & (x < high + PERCEPTION_RADIUS))
+    local = positions[nearby]
+    queries = np.flatnonzero((local[:, 0] >= low) & (local[:, 0] < high))
+    if len(queries) == 0:
+        return
+    accelerations = flock_accelerations(local, velocities[nearby], *weights, queries=queries)
+    owned = nearby[queries]
+    new_positions = positions[owned]
+    new_velocities = velocities[owned]
+    integrate_flock(new_positions, new_velocities, accelerations)
+    buffers[1 - read, 0, owned] = new_positions
+    buffers[1 - read, 1, owned] = new_velocities
+
+class SharedFlock:
+    # Array engine whose state lives in double-buffered shared memory. Each
+    # tick the flock is cut into vertical strips holding equal numbers of
+    # boids, workers step their strip from the read buffer into the write
+    # buffer, and the buffers swap. Every boid only depends on the read
+    # buffer, so the result is the same for any number of workers (and the
+    # same as ArrayFlock from the same seed).
+    def __init__(self, count=NUM_BOIDS, rng=None, workers=None):
+        initial = ArrayFlock(count, rng)
+        self.workers = workers or WORKERS
+        self.memory = shared_memory.SharedMemory(create=True, size=2 * 2 * count * 2 * 8)
+        self.buffers = np.ndarray((2, 2, count, 2), buffer=self.memory.buf)
+        self.buffers[0, 0] = initial.positions
+        self.buffers[0, 1] = initial.velocities
+        self.current = 0
+        self.trails = TrailBuffer(count)
+        self.pool = multiprocessing.Pool(self.workers, _attach_shared_flock, (self.memory.name, count))
+
+    @property
+    def positions(self):
+        return self.buffers[self.current, 0]
+
+    @property
+    def velocities(self):
+        return self.buffers[self.current, 1]
+
+    def state(self):
+        return self.positions, self.velocities
+
+    def step(self, separation_weight, alignment_weight, cohesion_weight, profiler=None):
+        # Workers run the rules, update and edges together; the profiler
+        # charges the whole pool round-trip to "apply_rules"
+        weights = (separation_weight, alignment_weight, cohesion_weight)
+        bounds = np.quantile(self.positions[:, 0], np.linspace(0, 1, self.workers + 1))
+        bounds[0], bounds[-1] = -np.inf, np.inf
+        tasks = [(self.current, low, high, weights) for low, high in zip(bounds[:-1], bounds[1:])]
+        self.pool.map(_step_shared_region, tasks)
+        self.current = 1 - self.current
+        self.trails.push(self.positions)
+        if profiler:
+            profiler.lap("apply_rules")
+
+    def draw(self, screen):
+        if RENDER_MODE == "sprites":
+            draw_sprites(screen, self.positions, self.velocities)
+        else:
+            for outline in boid_outlines(self.positions, self.velocities).tolist():
+                pygame.draw.polygon(screen, BOID_COLOR, outline)
+
+    def draw_trails(self, screen, stride=1):
+        self.trails.draw(screen, TRACE_COLOR, stride)
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+        del self.buffers
+        self.memory.close()
+        self.memory.unlink()
+
+def make_flock(count=None, seed=None, engine=None):
+    # count and engine default to the module settings at call time, so the
+    # command-line overrides applied in __main__ reach every caller
+    if count is None:
+        count = NUM_BOIDS
+    engine = engine or ENGINE
+    if engine == "numpy":
+        return ArrayFlock(count, np.random.default_rng(seed))
+    if engine == "shared":
+        return SharedFlock(count, np.random.default_rng(seed))
+    return BoidFlock(count, random.Random(seed) if seed is not None else random)
+
+# Per-tick flock metrics recorded by the headless runner
+METRICS = ("polarization", "mean_nn_distance", "clusters")
+
+def polarization(velocities):
+    # 1 when every boid heads the same way, near 0 for a disordered flock
+    speed = np.hypot(velocities[:, 0], velocities[:, 1])
+    headings = velocities / np.where(speed > 0, speed, 1)[:, None]
+    return float(np.hypot(*headings.mean(axis=0)))
+
+def nearest_neighbor_distances(positions):
+    # Cell-list search within PERCEPTION_RADIUS, brute force only for isolated boids
+    count = len(positions)
+    nearest = np.full(count, np.inf)
+    q, _, _, dist = neighbor_pairs(positions, PERCEPTION_RADIUS)
+    np.minimum.at(nearest, q, dist)
+    for i in np.flatnonzero(np.isinf(nearest)):
+        others = np.delete(positions, i, axis=0) - positions[i]
+        if len(others):
+            nearest[i] = np.hypot(others[:, 0], others[:, 1]).min()
+    return nearest
+
+def cluster_count(positions, radius=PERCEPTION_RADIUS):
+    # Connected components of the "within radius" graph, by min-label
+    # propagation with pointer jumping
+    q, j, _, _ = neighbor_pairs(positions, radius)
+    labels = np.arange(len(positions))
+    while True:
+        merged = labels.copy()
+        np.minimum.at(merged, q, labels[j])
+        merged = merged[merged]
+        if np.array_equal(merged, labels):
+            return len(np.unique(labels))
+        labels = merged
+
+def flock_metrics(flock):
+    positions, velocities = flock.state()
+    nearest = nearest_neighbor_distances(positions)
+    finite = nearest[np.isfinite(nearest)]
+    mean_nn = float(finite.mean()) if len(finite) else float("nan")
+    return polarization(velocities), mean_nn, cluster_count(positions)
+
+def open_recording(path, engine):
+    # engine is the one the recorded flock runs on, stored in the file's metadata
+    return TrajectoryWriter(path, simulation="boids", physics_rate=PHYSICS_RATE, engine=engine)
+
+def run_headless(ticks, seed=None, count=None, separation_weight=SEPARATION_WEIGHT,
+                 alignment_weight=ALIGNMENT_WEIGHT, cohesion_weight=COHESION_WEIGHT, engine=None,
+                 record=None):
+    # Step the flock as fast as possible without a display. Returns a
+    # (ticks, len(METRICS)) array with the metrics after every tick.
+    engine = engine or ENGINE
+    flock = make_flock(count, seed, engine)
+    metrics = np.empty((ticks, len(METRICS)))
+    writer = open_recording(record, engine) if record else None
+    try:
+        for tick in range(ticks):
+            flock.step(separation_weight, alignment_weight, cohesion_weight)
+            metrics[tick] = flock_metrics(flock)
+            if writer:
+                writer.append(tick + 1, *flock.state(), width=WIDTH, height=HEIGHT)
+    finally:
+        flock.close()
+        if writer:
+            writer.close()
+    return metrics
+
+def _run_sweep_case(case):
+    weights, ticks, seed, count, engine = case
+    metrics = run_headless(ticks, seed, count, *weights, engine=engine)
+    return weights, metrics.mean(axis=0)
+
+def sweep(separation_weights, alignment_weights, cohesion_weights, ticks, seed=None,
+          count=None, engine=None, processes=None):
+    # Run every weight combination in a process pool. Returns a list of
+    # ((separation, alignment, cohesion), mean metrics) in grid order.
+    count = NUM_BOIDS if count is None else count
+    engine = engine or ENGINE
+    cases = [(weights, ticks, seed, count, engine)
+             for weights in itertools.product(separation_weights, alignment_weights, cohesion_weights)]
+    with ProcessPoolExecutor(processes) as pool:
+        return list(pool.map(_run_sweep_case, cases))
+
+@functools.lru_cache(maxsize=None)
+def ui_font(size=36):
+    return pygame.font.Font(None, size)
+
+# Rendered labels are cached by text, so static labels are rendered once and
+# changing text only costs a render when its value actually changes
+@functools.lru_cache(maxsize=256)
+def render_text(text, color=(255, 255, 255), size=36):
+    return ui_font(size).render(text, True, color)
+
 def draw_sliders(screen, separation_weight, alignment_weight, cohesion_weight):
-    font = pygame.font.Font(None, 36)
-    screen.blit(font.render("Separation", True, (255, 255, 255)), (10, 10))
-    screen.blit(font.render("Alignment", True, (255, 255, 255)), (10, 60))
-    screen.blit(font.render("Cohesion", True, (255, 255, 255)), (10, 110))
+    screen.blit(render_text("Separation"), (10, 10))
+    screen.blit(render_text("Alignment"), (10, 60))
+    screen.blit(render_text("Cohesion"), (10, 110))
     
     pygame.draw.rect(screen, (200, 200, 200), (200, 10, 200, 20))
     pygame.draw.rect(screen, (200, 200, 200), (200, 60, 200, 20))
@@ -145,12 +714,115 @@ def draw_sliders(screen, separation_weight, alignment_weight, cohesion_weight):
     pygame.draw.rect(screen, (255, 100, 100), (200, 110, int(cohesion_weight * 100), 20))
 
 def draw_buttons(screen, tracing, reset):
-    font = pygame.font.Font(None, 36)
     pygame.draw.rect(screen, (100, 100, 255) if not tracing else (200, 200, 200), (10, 160, 150, 40))
-    screen.blit(font.render("Trace Paths", True, (255, 255, 255)), (20, 170))
+    screen.blit(render_text("Trace Paths"), (20, 170))
     
     pygame.draw.rect(screen, (255, 100, 100), (170, 160, 150, 40))
-    screen.blit(font.render("Reset", True, (255, 255, 255)), (200, 170))
+    screen.blit(render_text("Reset"), (200, 170))
+
+class DetailLevel:
+    # Level of detail chosen from the smoothed frame work time (excluding the
+    # wait in clock.tick). 0 draws everything, 1 draws boids as points with
+    # subsampled trails, 2 also redraws the UI only every UI_REFRESH_FRAMES.
+    # A level is held for at least hold frames so it does not flicker.
+    MAX_LEVEL = 2
+
+    def __init__(self, budget_ms=FRAME_BUDGET_MS, enabled=True, hold=60):
+        self.budget_ms = budget_ms
+        self.enabled = enabled
+        self.hold = hold
+        self.level = 0
+        self.smoothed_ms = budget_ms / 2
+        self.frames_at_level = 0
+
+    def update(self, frame_ms):
+        if not self.enabled:
+            return
+        self.smoothed_ms += 0.1 * (frame_ms - self.smoothed_ms)
+        self.frames_at_level += 1
+        if self.frames_at_level < self.hold:
+            return
+        if self.smoothed_ms > self.budget_ms * 1.2 and self.level < self.MAX_LEVEL:
+            self.level += 1
+            self.frames_at_level = 0
+        elif self.smoothed_ms < self.budget_ms * 0.5 and self.level > 0:
+            self.level -= 1
+            self.frames_at_level = 0
+
+    def trail_stride(self):
+        return 1 if self.level == 0 else 4
+
+# Frame phases timed by FrameProfiler, in overlay and export order
+PHASES = ("events", "apply_rules", "update", "edges", "draw", "trails", "ui", "present", "idle")
+PHASE_INDEX = {phase: index for index, phase in enumerate(PHASES)}
+
+class FrameProfiler:
+    # Per-phase frame timings taken with perf_counter_ns. lap(phase) charges the
+    # time since the previous lap to phase; end_frame() closes the frame. A
+    # disabled profiler is falsy and its methods are no-ops, so the calls can
+    # stay in the main loop.
+    def __init__(self, enabled=False, window=60, keep_history=False):
+        self.enabled = enabled
+        self.window = np.zeros((window, len(PHASES)), dtype=np.int64)
+        self.frame_ends = np.zeros(window, dtype=np.int64)
+        self.current = np.zeros(len(PHASES), dtype=np.int64)
+        self.frames = 0
+        self.history = [] if keep_history else None
+        self.overlay = []
+        self.mark = perf_counter_ns()
+        if not enabled:
+            self.lap = self.add = self.end_frame = self.draw = self._skip
+
+    def __bool__(self):
+        return self.enabled
+
+    def _skip(self, *args):
+        pass
+
+    def lap(self, phase):
+        now = perf_counter_ns()
+        if phase is not None:
+            self.current[PHASE_INDEX[phase]] += now - self.mark
+        self.mark = now
+
+    def add(self, phase, nanoseconds):
+        self.current[PHASE_INDEX[phase]] += nanoseconds
+
+    def end_frame(self, boid_count):
+        slot = self.frames % len(self.window)
+        self.window[slot] = self.current
+        self.frame_ends[slot] = self.mark
+        if self.history is not None:
+            self.history.append((self.frames, boid_count, *self.current.tolist()))
+        self.frames += 1
+        self.current[:] = 0
+        if self.frames % 15 == 0:
+            self.overlay = self.overlay_lines(boid_count)
+
+    def overlay_lines(self, boid_count):
+        filled = min(self.frames, len(self.window))
+        phase_ms = self.window[:filled].mean(axis=0) / 1e6
+        ends = np.sort(self.frame_ends[:filled])
+        fps = (filled - 1) * 1e9 / (ends[-1] - ends[0]) if filled > 1 and ends[-1] > ends[0] else 0.0
+        lines = [f"{fps:5.1f} FPS  {boid_count} boids"]
+        lines += [f"{phase:<12}{ms:7.2f} ms" for phase, ms in zip(PHASES, phase_ms)]
+        return lines
+
+    def draw(self, screen):
+        for row, line in enumerate(self.overlay):
+            screen.blit(render_text(line, (255, 255, 0), 20), (WIDTH - 200, 10 + 16 * row))
+
+    def export(self, path):
+        # Per-frame timings in nanoseconds, as CSV or (for *.json) JSON
+        columns = ("frame", "boids") + PHASES
+        if path.endswith(".json"):
+            with open(path, "w") as out:
+                json.dump([dict(zip(columns, row)) for row in self.history], out)
+        else:
+            with open(path, "w", newline="") as out:
+                writer = csv.writer(out)
+                writer.writerow(columns)
+                writer.writerows(self.history)
 
 def main():
     pygame.init()
@@ -158,23 +830,41 @@ def main():
     pygame.display.set_caption("Boid Flocking Simulation")
     clock = pygame.time.Clock()
 
-    boids = [Boid() for _ in range(NUM_BOIDS)]
+    flock = make_flock()
     separation_weight = SEPARATION_WEIGHT
     alignment_weight = ALIGNMENT_WEIGHT
     cohesion_weight = COHESION_WEIGHT
     tracing = False
     reset = False
+    profiler = FrameProfiler(PROFILE or bool(PROFILE_OUTPUT), keep_history=bool(PROFILE_OUTPUT))
+    timing = profiler if profiler else None
+    detail = DetailLevel(enabled=ADAPTIVE_DETAIL)
+    step_ms = 1000 / PHYSICS_RATE
+    accumulator = step_ms
+    frame = 0
+    tick = 0
+    writer = open_recording(RECORD_PATH, ENGINE) if RECORD_PATH else None
+    # Sliders and buttons are drawn into this panel, blitted with the
+    # background as colour key so antialiased text still blends correctly
+    ui_panel = pygame.Surface((410, 210))
+    ui_panel.set_colorkey(BACKGROUND_COLOR)
 
     while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                flock.close()
+                if writer:
+                    writer.close()
+                if PROFILE_OUTPUT:
+                    profiler.export(PROFILE_OUTPUT)
                 pygame.quit()
                 sys.exit()
             if event.type == MOUSEBUTTONDOWN:
                 if 10 <= event.pos[0] <= 160 and 160 <= event.pos[1] <= 200:
                     tracing = not tracing
                 if 170 <= event.pos[0] <= 320 and 160 <= event.pos[1] <= 200:
-                    boids = [Boid() for _ in range(NUM_BOIDS)]
+                    flock.close()
+                    flock = make_flock()
                     reset = True
                 # Slider interaction
                 if 200 <= event.pos[0] <= 400:
@@ -185,22 +875,154 @@ def main():
                     if 110 <= event.pos[1] <= 130:
                         cohesion_weight = (event.pos[0] - 200) / 200 * 3
 
+        profiler.lap("events")
+
+        # Fixed-timestep physics: run as many ticks as the elapsed time calls
+        # for, and drop the backlog beyond MAX_STEPS_PER_FRAME
+        steps = 0
+        while accumulator >= step_ms and steps < MAX_STEPS_PER_FRAME:
+            flock.step(separation_weight, alignment_weight, cohesion_weight, timing)
+            accumulator -= step_ms
+            steps += 1
+            tick += 1
+            if writer:
+                writer.append(tick, *flock.state(), width=WIDTH, height=HEIGHT)
+        if steps == MAX_STEPS_PER_FRAME:
+            accumulator = min(accumulator, step_ms)
+
         screen.fill(BACKGROUND_COLOR)
-        
-        for boid in boids:
-            boid.apply_rules(boids, separation_weight, alignment_weight, cohesion_weight)
-            boid.update()
-            boid.edges()
-            boid.draw(screen)
-            if tracing:
-                if len(boid.path) > 1:
-                    pygame.draw.lines(screen, TRACE_COLOR, False, [(p.x, p.y) for p in boid.path], 1)
+        if detail.level == 0:
+            flock.draw(screen)
+        else:
+            draw_points(screen, flock.state()[0], BOID_COLOR)
+        profiler.lap("draw")
+        if tracing:
+            flock.draw_trails(screen, detail.trail_stride())
+            profiler.lap("trails")
 
-        draw_sliders(screen, separation_weight, alignment_weight, cohesion_weight)
-        draw_buttons(screen, tracing, reset)
+        if detail.level < 2 or frame % UI_REFRESH_FRAMES == 0:
+            ui_panel.fill(BACKGROUND_COLOR)
+            draw_sliders(ui_panel, separation_weight, alignment_weight, cohesion_weight)
+            draw_buttons(ui_panel, tracing, reset)
+        screen.blit(ui_panel, (0, 0))
+        profiler.draw(screen)
+        profiler.lap("ui")
 
         pygame.display.flip()
-        clock.tick(FPS)
+        profiler.lap("present")
+        accumulator += clock.tick(FPS)
+        detail.update(clock.get_rawtime())
+        frame += 1
+        profiler.lap("idle")
+        profiler.end_frame(NUM_BOIDS)
+
+def replay(path):
+    # Play back a recording at PHYSICS_RATE frames per second. Frames come from
+    # the memory-mapped file on demand, so scrubbing is O(1) per frame. Click or
+    # drag the bar at the bottom to scrub; space pauses, left/right step one
+    # frame, home/end jump to the ends.
+    recording = TrajectoryReader(path)
+    if len(recording) == 0:
+        print(f"{path}: no frames recorded")
+        return
+    last = len(recording) - 1
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption(f"Boid Flocking Replay - {path}")
+    clock = pygame.time.Clock()
+    bar = pygame.Rect(10, HEIGHT - 30, WIDTH - 20, 20)
+    frame = 0
+    playing = True
+    scrubbing = False
+
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                return
+            if event.type == MOUSEBUTTONDOWN and bar.collidepoint(event.pos):
+                scrubbing, playing = True, False
+            if event.type == MOUSEBUTTONUP:
+                scrubbing = False
+            if event.type == KEYDOWN:
+                if event.key == K_SPACE:
+                    playing = not playing
+                elif event.key == K_LEFT:
+                    frame, playing = frame - 1, False
+                elif event.key == K_RIGHT:
+                    frame, playing = frame + 1, False
+                elif event.key == K_HOME:
+                    frame = 0
+                elif event.key == K_END:
+                    frame = last
+        if scrubbing:
+            frame = round((pygame.mouse.get_pos()[0] - bar.x) / bar.width * last)
+        elif playing and frame < last:
+            frame += 1
+        frame = min(max(frame, 0), last)
+
+        screen.fill(BACKGROUND_COLOR)
+        positions, velocities = recording.positions(frame), recording.velocities(frame)
+        if RENDER_MODE == "sprites":
+            draw_sprites(screen, positions, velocities)
+        else:
+            for outline in boid_outlines(positions, velocities).tolist():
+                pygame.draw.polygon(screen, BOID_COLOR, outline)
+
+        pygame.draw.rect(screen, (200, 200, 200), bar)
+        pygame.draw.rect(screen, (100, 100, 255), (bar.x, bar.y, int(bar.width * frame / max(last, 1)), bar.height))
+        screen.blit(render_text(f"Frame {frame} / {last}  tick {recording.tick(frame)}"), (10, HEIGHT - 60))
+        pygame.display.flip()
+        clock.tick(PHYSICS_RATE)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Boid flocking simulation")
+    parser.add_argument("--engine", choices=("numpy", "objects", "shared"), default=ENGINE)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--boids", type=int, default=NUM_BOIDS)
+    parser.add_argument("--trail-length", type=int, default=TRAIL_LENGTH)
+    parser.add_argument("--render", choices=("sprites", "polygons"), default=RENDER_MODE)
+    parser.add_argument("--physics-rate", type=float, default=PHYSICS_RATE, help="physics ticks per second")
+    parser.add_argument("--full-detail", action="store_true", help="disable adaptive level of detail")
+    parser.add_argument("--profile", action="store_true", help="show per-phase frame timings on screen")
+    parser.add_argument("--profile-out", default=PROFILE_OUTPUT, help="write per-frame timings to this .csv or .json file on exit")
+    parser.add_argument("--headless", action="store_true", help="run without a display and print per-tick metrics as CSV")
+    parser.add_argument("--sweep", action="store_true", help="run a weight sweep in a process pool and print mean metrics as CSV")
+    parser.add_argument("--ticks", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--separation", type=float, nargs="+", default=[SEPARATION_WEIGHT])
+    parser.add_argument("--alignment", type=float, nargs="+", default=[ALIGNMENT_WEIGHT])
+    parser.add_argument("--cohesion", type=float, nargs="+", default=[COHESION_WEIGHT])
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--record", metavar="DIR", help="record every physics tick to this trajectory directory")
+    parser.add_argument("--replay", metavar="DIR", help="play back a recorded trajectory instead of simulating")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    ENGINE = args.engine
+    WORKERS = args.workers
+    NUM_BOIDS = args.boids
+    TRAIL_LENGTH = args.trail_length
+    RENDER_MODE = args.render
+    PROFILE = args.profile
+    PHYSICS_RATE = args.physics_rate
+    ADAPTIVE_DETAIL = not args.full_detail
+    PROFILE_OUTPUT = args.profile_out
+    RECORD_PATH = args.record
+    if args.replay:
+        replay(args.replay)
+    elif args.sweep:
+        print("separation,alignment,cohesion," + ",".join(METRICS))
+        results = sweep(args.separation, args.alignment, args.cohesion, args.ticks,
+                        args.seed, args.boids, args.engine, args.processes)
+        for weights, means in results:
+            print(",".join(f"{value:g}" for value in (*weights, *means)))
+    elif args.headless:
+        print("tick," + ",".join(METRICS))
+        metrics = run_headless(args.ticks, args.seed, args.boids, args.separation[0],
+                               args.alignment[0], args.cohesion[0], args.engine, args.record)
+        for tick, row in enumerate(metrics):
+            print(f"{tick}," + ",".join(f"{value:g}" for value in row))
+    else:
+        main()
@@ -1,9 +1,19 @@
+import os
+import math
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np 
 from numpy import cos, sin
 import matplotlib.pyplot as plt
 
 import matplotlib.animation as animation
 
+try:
+    import numba
+except ImportError:  # optional: without it the compiled RK4 backend is unavailable
+    numba = None
+
 G = 9.8  # acceleration due to gravity, in m/s^2
 L1 = 1.0  # length of pendulum 1 in m
 L2 = 1.0  # length of pendulum 2 in m
@@ -13,34 +23,430 @@ M2 = 1.0  # mass of pendulum 2 in kg
 t_stop = 20  # how many seconds to simulate
 history_len = 500  # how many trajectory points to display
 
+# integrator: "euler", "rk4", "midpoint" (implicit) or "dopri5" (Dormand-Prince 5(4)).
+# With rtol set, every method adapts its step to the tolerance; without it
+# the step is fixed at dt. Results are sampled every dt by dense output.
+method = "dopri5"
+dt = 0.01
+rtol = 1e-8
+atol = 1e-10
+
 
-def derivs(t, state):
-    dydx = np.zeros_like(state)
+# Scalar RK4 kernel for a (M, 4) batch: each pendulum is stepped in plain
+# floats, with the right-hand side written out once per stage. jit compiles
+# both functions (numba.njit); without it the kernel is the pure Python baseline.
+def make_rk4_kernel(jit=None):
+    jit = jit or (lambda function: function)
 
-    dydx[0] = state[1]
+    @jit
+    def rhs(th1, w1, th2, w2, g, l1, l2, m2, total):
+        delta = th2 - th1
+        s = math.sin(delta)
+        c = math.cos(delta)
+        g1 = g * math.sin(th1)
+        g2 = g * math.sin(th2)
+        spin1 = l1 * w1 * w1 * s
+        spin2 = l2 * w2 * w2 * s
+        den = total - m2 * c * c
+        return (w1, (m2 * (spin1 * c + g2 * c + spin2) - total * g1) / (l1 * den),
+                w2, (total * (g1 * c - spin1 - g2) - m2 * spin2 * c) / (l2 * den))
 
-    delta = state[2] - state[0]
-    den1 = (M1+M2) * L1 - M2 * L1 * cos(delta) * cos(delta)
-    dydx[1] = ((M2 * L1 * state[1] * state[1] * sin(delta) * cos(delta)
-                + M2 * G * sin(state[2]) * cos(delta)
-                + M2 * L2 * state[3] * state[3] * sin(delta)
-                - (M1+M2) * G * sin(state[0]))
-               / den1)
+    @jit
+    def kernel(states, dt, steps, g, l1, l2, m2, total):
+        out = states.copy()
+        half = dt / 2
+        for n in range(out.shape[0]):
+            y0, y1, y2, y3 = out[n, 0], out[n, 1], out[n, 2], out[n, 3]
+            for _ in range(steps):
+                a0, a1, a2, a3 = rhs(y0, y1, y2, y3, g, l1, l2, m2, total)
+                b0, b1, b2, b3 = rhs(y0 + half * a0, y1 + half * a1, y2 + half * a2, y3 + half * a3,
+                                     g, l1, l2, m2, total)
+                c0, c1, c2, c3 = rhs(y0 + half * b0, y1 + half * b1, y2 + half * b2, y3 + half * b3,
+                                     g, l1, l2, m2, total)
+                d0, d1, d2, d3 = rhs(y0 + dt * c0, y1 + dt * c1, y2 + dt * c2, y3 + dt * c3,
+                                     g, l1, l2, m2, total)
+                y0 += dt / 6 * (a0 + 2 * b0 + 2 * c0 + d0)
+                y1 += dt / 6 * (a1 + 2 * b1 + 2 * c1 + d1)
+                y2 += dt / 6 * (a2 + 2 * b2 + 2 * c2 + d2)
+                y3 += dt / 6 * (a3 + 2 * b3 + 2 * c3 + d3)
+            out[n, 0], out[n, 1], out[n, 2], out[n, 3] = y0, y1, y2, y3
+        return out
 
-    dydx[2] = state[3]
+    return kernel
 
-    den2 = (L2/L1) * den1
-    dydx[3] = ((- M2 * L2 * state[3] * state[3] * sin(delta) * cos(delta)
-                + (M1+M2) * G * sin(state[0]) * cos(delta)
-                - (M1+M2) * L1 * state[1] * state[1] * sin(delta)
-                - (M1+M2) * G * sin(state[2]))
-               / den2)
 
-    return dydx
+python_rk4 = make_rk4_kernel()
+compiled_rk4 = make_rk4_kernel(numba.njit) if numba else None
+
+
+# A double pendulum with its parameters. derivs() evaluates the equations of
+# motion for a state (th1, w1, th2, w2) along the last axis, so a (M, 4) array
+# holds M pendulums and one call evaluates them all. The trigonometric terms,
+# squared angular velocities and total mass are each computed once per call.
+class DoublePendulum:
+    def __init__(self, g=G, l1=L1, l2=L2, m1=M1, m2=M2):
+        self.g, self.l1, self.l2, self.m1, self.m2 = g, l1, l2, m1, m2
+        self.total = m1 + m2
+
+    def derivs(self, t, state):
+        g, l1, l2, m2, total = self.g, self.l1, self.l2, self.m2, self.total
+        w1, w2 = state[..., 1], state[..., 3]
+        delta = state[..., 2] - state[..., 0]
+        s, c = sin(delta), cos(delta)
+        g1, g2 = g * sin(state[..., 0]), g * sin(state[..., 2])
+        spin1, spin2 = l1 * w1 * w1 * s, l2 * w2 * w2 * s
+        den = total - m2 * c * c
+
+        dydx = np.empty_like(state)
+        dydx[..., 0] = w1
+        dydx[..., 1] = (m2 * (spin1 * c + g2 * c + spin2) - total * g1) / (l1 * den)
+        dydx[..., 2] = w2
+        dydx[..., 3] = (total * (g1 * c - spin1 - g2) - m2 * spin2 * c) / (l2 * den)
+        return dydx
+
+    # total mechanical energy (J) of the states in y, with the pivot at zero height
+    def energy(self, y):
+        th1, w1, th2, w2 = y[..., 0], y[..., 1], y[..., 2], y[..., 3]
+        l1, l2, m2 = self.l1, self.l2, self.m2
+        kinetic = (0.5 * self.m1 * (l1 * w1) ** 2
+                   + 0.5 * m2 * ((l1 * w1) ** 2 + (l2 * w2) ** 2 + 2 * l1 * l2 * w1 * w2 * cos(th1 - th2)))
+        potential = -self.total * self.g * l1 * cos(th1) - m2 * self.g * l2 * cos(th2)
+        return kinetic + potential
+
+    # lowest potential energy with one arm pointing straight up: below it
+    # neither arm can ever flip over the pivot
+    @property
+    def flip_barrier(self):
+        upper = self.total * self.g * self.l1 - self.m2 * self.g * self.l2
+        return min(upper, -upper)
+
+    # steps fixed RK4 steps of a (M, 4) batch. backend is "numpy" (array
+    # operations over the batch), "numba" (compiled scalar kernel), "python"
+    # (the same kernel uncompiled) or "auto" (numba when installed, else numpy).
+    def rk4(self, states, dt, steps, backend="auto"):
+        states = np.array(states, dtype=float).reshape(-1, 4)
+        if backend == "auto":
+            backend = "numba" if compiled_rk4 else "numpy"
+        if backend == "numpy":
+            now = 0.0
+            for _ in range(steps):
+                states = rk4_step(self.derivs, now, states, dt, self.derivs(now, states))
+                now += dt
+            return states
+        if backend == "numba" and compiled_rk4 is None:
+            raise ImportError("the numba backend needs numba installed")
+        kernel = compiled_rk4 if backend == "numba" else python_rk4
+        return kernel(states, dt, steps, self.g, self.l1, self.l2, self.m2, self.total)
+
+
+pendulum = DoublePendulum()
+derivs = pendulum.derivs
+energy = pendulum.energy
+
+
+# One step of size h from (t, y), given f0 = f(t, y)
+def euler_step(f, t, y, h, f0):
+    return y + h * f0
+
+
+def rk4_step(f, t, y, h, f0):
+    k2 = f(t + h/2, y + h/2 * f0)
+    k3 = f(t + h/2, y + h/2 * k2)
+    k4 = f(t + h, y + h * k3)
+    return y + h/6 * (f0 + 2*k2 + 2*k3 + k4)
+
+
+# implicit midpoint rule y1 = y + h f(t + h/2, (y + y1)/2), solved by
+# fixed-point iteration from an explicit Euler guess. It is time-reversible, so
+# its energy error oscillates instead of growing like the explicit methods'.
+def midpoint_step(f, t, y, h, f0, tol=1e-13, max_iter=50):
+    y1 = y + h * f0
+    for _ in range(max_iter):
+        new = y + h * f(t + h/2, (y + y1) / 2)
+        converged = np.max(np.abs(new - y1)) <= tol * (1 + np.max(np.abs(new)))
+        y1 = new
+        if converged:
+            break
+    return y1
+
+
+# name: (step function, order)
+FIXED_STEP = {"euler": (euler_step, 1), "rk4": (rk4_step, 4), "midpoint": (midpoint_step, 2)}
+
+# Dormand-Prince 5(4) tableau, its embedded error weights (5th minus 4th order,
+# the last entry weighting the FSAL stage) and the 4th-order dense output matrix
+DOPRI_C = (0, 1/5, 3/10, 4/5, 8/9, 1)
+DOPRI_A = (
+    (),
+    (1/5,),
+    (3/40, 9/40),
+    (44/45, -56/15, 32/9),
+    (19372/6561, -25360/2187, 64448/6561, -212/729),
+    (9017/3168, -355/33, 46732/5247, 49/176, -5103/18656),
+    (35/384, 0, 500/1113, 125/192, -2187/6784, 11/84),
+)
+DOPRI_E = np.array((71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40))
+DOPRI_P = np.array((
+    (1.0, -2.8535800653862835, 3.0717434641059005, -1.1270175653862835),
+    (0.0, 0.0, 0.0, 0.0),
+    (0.0, 4.023133379230305, -6.249321565289, 2.675424484351598),
+    (0.0, -3.7324019615885042, 10.068970589843675, -5.685526961588504),
+    (0.0, 2.5548038301849423, -6.399112377351017, 3.5219323679207912),
+    (0.0, -1.3744241142186024, 3.272657752246729, -1.7672812570757455),
+    (0.0, 1.3824689317781436, -3.764937863556287, 2.382468931778144),
+))
+
+
+def dopri5_step(f, t, y, h, f0):
+    k = [f0]
+    for c, a in zip(DOPRI_C[1:] + (1,), DOPRI_A[1:]):
+        y1 = y + h * sum(coefficient * stage for coefficient, stage in zip(a, k) if coefficient)
+        k.append(f(t + c * h, y1))
+    k = np.array(k)
+    error = h * np.tensordot(DOPRI_E, k, axes=1)
+
+    def dense(theta):
+        weights = theta[:, None] ** np.arange(1, 5) @ DOPRI_P.T
+        return y + h * np.tensordot(weights, k, axes=1)
+
+    # the last stage is evaluated at y1, so it is f1 for the next step (FSAL)
+    return y1, k[-1], error, dense
+
+
+def hermite(y0, f0, y1, f1, h):
+    # cubic Hermite interpolant through both step ends, for theta in [0, 1]
+    def dense(theta):
+        theta = theta.reshape((-1,) + (1,) * np.ndim(y0))
+        theta2, theta3 = theta * theta, theta * theta * theta
+        return ((2*theta3 - 3*theta2 + 1) * y0 + (theta3 - 2*theta2 + theta) * h * f0
+                + (3*theta2 - 2*theta3) * y1 + (theta3 - theta2) * h * f1)
+    return dense
+
+
+def take_step(f, method, t, y, h, f0, estimate):
+    # Returns (y1, f1, error estimate or None, dense output over theta in [0, 1])
+    if method == "dopri5":
+        return dopri5_step(f, t, y, h, f0)
+    step, order = FIXED_STEP[method]
+    if not estimate:
+        y1 = step(f, t, y, h, f0)
+        f1 = f(t + h, y1)
+        return y1, f1, None, hermite(y, f0, y1, f1, h)
+    # step doubling: two half steps against one full step, Richardson error estimate
+    coarse = step(f, t, y, h, f0)
+    half = step(f, t, y, h/2, f0)
+    y1 = step(f, t + h/2, half, h/2, f(t + h/2, half))
+    f1 = f(t + h, y1)
+    return y1, f1, (y1 - coarse) / (2 ** order - 1), hermite(y, f0, y1, f1, h)
+
+
+# Step dy/dt = f(t, y) from state at t0 up to t_end (forever if t_end is inf),
+# yielding (t, h, dense, last) for every accepted step, where dense(theta) gives
+# y at t + theta*h for an array of theta in [0, 1]. With rtol None the step is
+# fixed at dt; otherwise dt is the first step and the step adapts so the local
+# error stays below atol + rtol*|y| (RMS norm). Step counts are added to stats.
+def accepted_steps(f, t0, state, method=method, dt=dt, rtol=None, atol=atol, t_end=np.inf, stats=None):
+    stats = stats if stats is not None else {}
+    stats.setdefault("steps", 0)
+    stats.setdefault("rejected", 0)
+    y = np.asarray(state, dtype=float)
+    exponent = -1 / ((4 if method == "dopri5" else FIXED_STEP[method][1]) + 1)
+    now, h = t0, dt
+    f0 = f(now, y)
+    retry = False
+    while True:
+        last = h >= t_end - now
+        if last:
+            h = t_end - now
+        y1, f1, error, dense = take_step(f, method, now, y, h, f0, rtol is not None)
+        factor = 1
+        if rtol is not None:
+            scale = atol + rtol * np.maximum(np.abs(y), np.abs(y1))
+            norm = np.sqrt(np.mean((error / scale) ** 2))
+            factor = 5 if norm == 0 else min(5, max(0.2, 0.9 * norm ** exponent))
+            if norm > 1:
+                h *= factor
+                stats["rejected"] += 1
+                retry = True
+                continue
+            # no growth straight after a rejection, which would likely be rejected again
+            if retry:
+                factor, retry = min(factor, 1), False
+        stats["steps"] += 1
+        yield now, h, dense, last
+        if last:
+            return
+        now, y, f0 = now + h, y1, f1
+        h *= factor
+
+
+# Integrate dy/dt = f(t, y) from state at t[0], returning y sampled at every time
+# in t plus step statistics. Output between steps comes from dense output, so
+# large steps still give samples on the t grid.
+def integrate(f, t, state, method=method, dt=dt, rtol=None, atol=atol):
+    stats = {"evaluations": 0}
+
+    def counted(time, y):
+        stats["evaluations"] += 1
+        return f(time, y)
+
+    t = np.asarray(t, dtype=float)
+    out = np.empty((len(t),) + np.shape(state))
+    out[0] = state
+    k = 1
+    if len(t) > 1:
+        for now, h, dense, last in accepted_steps(counted, t[0], state, method, dt, rtol, atol, t[-1], stats):
+            stop = len(t) if last else np.searchsorted(t, now + h, side="right")
+            if stop > k:
+                out[k:stop] = dense((t[k:stop] - now) / h)
+                k = stop
+    return out, stats
+
+
+# Yield the state every dt seconds from state, without end. Steps are only
+# taken as samples are consumed, so the integration runs just ahead of the
+# display and memory does not grow with the run time.
+def stream(state, dt=dt, method=method, rtol=rtol, atol=atol, model=pendulum):
+    yield np.asarray(state, dtype=float)
+    k = 1
+    for now, h, dense, _ in accepted_steps(model.derivs, 0.0, state, method, dt, rtol, atol):
+        count = int(np.floor((now + h) / dt + 1e-9)) - k + 1
+        if count > 0:
+            yield from dense((np.arange(k, k + count) * dt - now) / h)
+            k += count
+
+
+# Integrate with every method and print how far each lets the energy drift,
+# to pick the cheapest one that meets a tolerance over long runs
+def energy_report(state, t, dt=dt, rtol=rtol, model=pendulum):
+    e0 = model.energy(state)
+    print(f"t = {t[0]:g} .. {t[-1]:g} s, E0 = {e0:.6f} J")
+    print(f"{'method':<10}{'control':>16}{'steps':>9}{'rejected':>10}{'f evals':>10}{'seconds':>10}{'max |dE| (J)':>15}{'final dE (J)':>15}")
+    runs = [(name, None) for name in ("euler", "rk4", "midpoint", "dopri5")]
+    runs += [(name, rtol) for name in ("rk4", "midpoint", "dopri5")]
+    for name, tolerance in runs:
+        start = time.perf_counter()
+        y, stats = integrate(model.derivs, t, state, name, dt, tolerance)
+        seconds = time.perf_counter() - start
+        drift = model.energy(y) - e0
+        control = f"dt={dt:g}" if tolerance is None else f"rtol={tolerance:g}"
+        print(f"{name:<10}{control:>16}{stats['steps']:>9}{stats['rejected']:>10}{stats['evaluations']:>10}"
+              f"{seconds:>10.3f}{np.max(np.abs(drift)):>15.3e}{drift[-1]:>15.3e}")
+
+
+# Ensembles: every function below steps a whole (M, 4) batch of pendulums with
+# fixed-step RK4, processing at most ensemble_block states at a time so the
+# working arrays stay in cache
+ensemble_block = 4096
+flip_t_max = 10.0  # seconds simulated per initial condition in a flip-time map
+flip_map_size = 256  # flip-time map resolution (size x size initial conditions)
+
+
+# Time until either arm first flips over the pivot (|th| passes pi) for every
+# state in the (M, 4) array states, or inf if it has not flipped by t_max.
+# States without the energy to lift either arm over the top are never stepped.
+def flip_times(states, t_max=flip_t_max, dt=dt, block=ensemble_block, model=pendulum):
+    states = np.asarray(states, dtype=float).reshape(-1, 4)
+    result = np.full(len(states), np.inf)
+    candidates = np.flatnonzero(model.energy(states) >= model.flip_barrier)
+    for start in range(0, len(candidates), block):
+        active = candidates[start:start + block]
+        y = states[active]
+        now = 0.0
+        while len(active) and now < t_max:
+            y = rk4_step(model.derivs, now, y, dt, model.derivs(now, y))
+            now += dt
+            flipped = (np.abs(y[:, 0]) > np.pi) | (np.abs(y[:, 2]) > np.pi)
+            if flipped.any():
+                result[active[flipped]] = now
+                active, y = active[~flipped], y[~flipped]
+    return result
+
+
+def _flip_time_rows(case):
+    th1_rows, th2, t_max, dt, model = case
+    grid = np.zeros((len(th1_rows), len(th2), 4))
+    grid[..., 0] = th1_rows[:, None]
+    grid[..., 2] = th2[None, :]
+    return flip_times(grid, t_max, dt, model=model).reshape(len(th1_rows), len(th2))
+
+
+# Flip-time map over a size x size grid of initial angles in [-pi, pi] (both
+# arms at rest). Row i is th1[i], column j th2[j]. Rows are split into chunks
+# that run on a process pool, each with its own copy of model.
+def flip_time_map(size=flip_map_size, t_max=flip_t_max, dt=dt, processes=None, model=pendulum):
+    th1 = np.linspace(-np.pi, np.pi, size)
+    th2 = np.linspace(-np.pi, np.pi, size)
+    processes = processes or os.cpu_count() or 1
+    chunks = np.array_split(th1, min(size, 4 * processes))
+    cases = [(rows, th2, t_max, dt, model) for rows in chunks]
+    if processes == 1:
+        rows = list(map(_flip_time_rows, cases))
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            rows = list(pool.map(_flip_time_rows, cases))
+    return np.vstack(rows), th1, th2
+
+
+# Save a flip-time map as .npy (raw times, inf = no flip) or as an image
+# coloured by log10 of the flip time, with pendulums that never flip in black
+def save_flip_map(path, times):
+    if path.endswith(".npy"):
+        np.save(path, times)
+        return
+    image = np.log10(times)
+    cmap = plt.get_cmap("viridis").with_extremes(bad="black")
+    plt.imsave(path, np.ma.masked_invalid(image), cmap=cmap, origin="lower")
+
+
+# Largest Lyapunov exponent (1/s) of each state in the (M, 4) array states
+# (Benettin's method): every state is integrated next to a copy displaced by
+# d0, and the separation is measured and rescaled back to d0 every
+# renormalize steps. The log growth rates average to the exponent.
+def lyapunov_exponents(states, t_stop=t_stop, dt=dt, d0=1e-8, renormalize=10, model=pendulum):
+    states = np.asarray(states, dtype=float).reshape(-1, 4)
+    count = len(states)
+    offset = np.zeros_like(states)
+    offset[:, 0] = d0
+    y = np.concatenate((states, states + offset))
+    growth = np.zeros(count)
+    now = 0.0
+    steps = int(round(t_stop / dt))
+    for step in range(1, steps + 1):
+        y = rk4_step(model.derivs, now, y, dt, model.derivs(now, y))
+        now += dt
+        if step % renormalize == 0 or step == steps:
+            separation = y[count:] - y[:count]
+            distance = np.sqrt(np.einsum("ij,ij->i", separation, separation))
+            growth += np.log(distance / d0)
+            y[count:] = y[:count] + separation * (d0 / distance)[:, None]
+    return growth / (steps * dt)
+
+
+# Print pendulum-steps per second of every RK4 backend for each ensemble size
+# and step count. The compiled kernel is warmed up first, so compile time is
+# not counted; the pure Python kernel skips runs over python_budget steps.
+def benchmark(sizes=(1, 100, 10000), step_counts=(100, 1000), python_budget=200000):
+    backends = ["python", "numpy"] + (["numba"] if compiled_rk4 else [])
+    if compiled_rk4:
+        pendulum.rk4(np.zeros((1, 4)), dt, 1, "numba")
+    else:
+        print("numba not installed: compiled backend skipped")
+    rng = np.random.default_rng(0)
+    print(f"{'pendulums':>10}{'steps':>8}" + "".join(f"{name + ' steps/s':>18}" for name in backends))
+    for size in sizes:
+        states = rng.uniform(-np.pi, np.pi, (size, 4)) * [1, 0, 1, 0]
+        for steps in step_counts:
+            row = f"{size:>10}{steps:>8}"
+            for backend in backends:
+                if backend == "python" and size * steps > python_budget:
+                    row += f"{'-':>18}"
+                    continue
+                start = time.perf_counter()
+                pendulum.rk4(states, dt, steps, backend)
+                row += f"{size * steps / (time.perf_counter() - start):>18.3e}"
+            print(row)
 
-# create a time array from 0..t_stop sampled at 0.02 second steps
-dt = 0.01
-t = np.arange(0, t_stop, dt)
 
 # th1 and th2 are the initial angles (degrees)
 # w10 and w20 are the initial angular velocities (degrees per second)
@@ -49,49 +455,123 @@ w1 = 0.0
 th2 = -10.0
 w2 = 0.0
 
-# initial state
-state = np.radians([th1, w1, th2, w2])
 
-# integrate the ODE using Euler's method
-y = np.empty((len(t), 4))
-y[0] = state
-for i in range(1, len(t)):
-    y[i] = y[i - 1] + derivs(t[i - 1], y[i - 1]) * dt
+# state at rest with the outer bob at (x, y), or as close as the arms reach,
+# with the inner arm on the clockwise side of the line from the pivot
+def pose_state(x, y):
+    reach = np.clip(np.hypot(x, y), abs(L1 - L2) + 1e-9, L - 1e-9)
+    direction = np.arctan2(x, -y)
+    elbow = np.arccos((L1 * L1 + reach * reach - L2 * L2) / (2 * L1 * reach))
+    angle1 = direction - elbow
+    x1, y1 = L1 * sin(angle1), -L1 * cos(angle1)
+    x2, y2 = reach * sin(direction), -reach * cos(direction)
+    return np.array([angle1, 0.0, np.arctan2(x2 - x1, -(y2 - y1)), 0.0])
+
+
+# Animate the pendulum. By default the states come from stream(), so the run
+# has no end and the cost per frame stays constant; with precompute the first
+# t_stop seconds are integrated up front and replayed in a loop. The trace
+# shows the last history_len positions of the outer bob. Clicking the plot
+# restarts from rest with the outer bob at the clicked point.
+def main(method=method, dt=dt, rtol=rtol, precompute=False):
+    fig = plt.figure(figsize=(5, 4))
+    ax = fig.add_subplot(autoscale_on=False, xlim=(-L, L), ylim=(-L, 1.))
+    ax.set_aspect('equal')
+    ax.grid()
+
+    line, = ax.plot([], [], 'o-', lw=2)
+    trace, = ax.plot([], [], '.-', lw=1, ms=2)
+    time_template = 'time = %.1fs'
+    time_text = ax.text(0.05, 0.9, '', transform=ax.transAxes)
+
+    # trace ring buffer: every point is written twice, history_len apart, so the
+    # last history_len points are always the contiguous slice after the head
+    history = np.full((2 * history_len, 2), np.nan)
+    player = {}
+
+    def restart(state):
+        if precompute:
+            player["run"], _ = integrate(derivs, np.arange(0, t_stop, dt), state, method, dt, rtol)
+            player["states"] = iter(player["run"])
+        else:
+            player["states"] = stream(state, dt, method, rtol)
+        player["frame"] = 0
+        history[:] = np.nan
 
-# A more accurate estimate could be obtained e.g. using scipy:
-#
-#   y = scipy.integrate.solve_ivp(derivs, t[[0, -1]], state, t_eval=t).y.T
+    def animate(i):
+        state = next(player["states"], None)
+        if state is None:
+            player["states"], player["frame"] = iter(player["run"]), 0
+            history[:] = np.nan
+            state = next(player["states"])
+        frame = player["frame"]
+        player["frame"] += 1
 
-x1 = L1*sin(y[:, 0])
-y1 = -L1*cos(y[:, 0])
+        x1 = L1*sin(state[0])
+        y1 = -L1*cos(state[0])
 
-x2 = L2*sin(y[:, 2]) + x1
-y2 = -L2*cos(y[:, 2]) + y1
+        x2 = L2*sin(state[2]) + x1
+        y2 = -L2*cos(state[2]) + y1
 
-fig = plt.figure(figsize=(5, 4))
-ax = fig.add_subplot(autoscale_on=False, xlim=(-L, L), ylim=(-L, 1.))
-ax.set_aspect('equal')
-ax.grid()
+        head = frame % history_len
+        history[head] = history[head + history_len] = x2, y2
+        recent = history[head + 1:head + 1 + history_len]
 
-line, = ax.plot([], [], 'o-', lw=2)
-trace, = ax.plot([], [], '.-', lw=1, ms=2)
-time_template = 'time = %.1fs'
-time_text = ax.text(0.05, 0.9, '', transform=ax.transAxes)
+        line.set_data([0, x1, x2], [0, y1, y2])
+        trace.set_data(recent[:, 0], recent[:, 1])
+        time_text.set_text(time_template % (frame*dt))
+        return line, trace, time_text
 
+    def on_click(event):
+        if event.inaxes is ax:
+            restart(pose_state(event.xdata, event.ydata))
 
-def animate(i):
-    thisx = [0, x1[i], x2[i]]
-    thisy = [0, y1[i], y2[i]]
+    restart(np.radians([th1, w1, th2, w2]))
+    fig.canvas.mpl_connect("button_press_event", on_click)
+    ani = animation.FuncAnimation(
+        fig, animate, interval=dt*1000, blit=True, cache_frame_data=False)
+    plt.show()
 
-    history_x = x2[:i]
-    history_y = y2[:i]
 
-    line.set_data(thisx,thisy)
-    trace.set_data(history_x, history_y)
-    time_text.set_text(time_template % (i*dt))
-    return line, trace, time_text
+def parse_args():
+    parser = argparse.ArgumentParser(description="Double pendulum visualizer")
+    parser.add_argument("--method", choices=("euler", "rk4", "midpoint", "dopri5"), default=method)
+    parser.add_argument("--dt", type=float, default=dt, help="output sample spacing, and the step when not adaptive")
+    parser.add_argument("--rtol", type=float, default=rtol, help="relative tolerance for adaptive stepping")
+    parser.add_argument("--fixed", action="store_true", help="use fixed steps of dt instead of adaptive stepping")
+    parser.add_argument("--t-stop", type=float, default=t_stop)
+    parser.add_argument("--precompute", action="store_true", help="integrate t_stop seconds up front and loop them "
+                        "instead of streaming")
+    parser.add_argument("--compare", action="store_true", help="print the energy drift of every integrator and exit")
+    parser.add_argument("--flip-map", metavar="FILE", help="compute a flip-time map and save it as .png or .npy")
+    parser.add_argument("--size", type=int, default=flip_map_size, help="flip-time map resolution")
+    parser.add_argument("--t-max", type=float, default=flip_t_max, help="seconds simulated per flip-time map point")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--benchmark", action="store_true", help="print RK4 throughput of every backend and exit")
+    parser.add_argument("--lyapunov", type=int, metavar="M", help="estimate Lyapunov exponents of M states "
+                        "perturbed around the initial state and exit")
+    return parser.parse_args()
 
 
-ani = animation.FuncAnimation(
-    fig, animate, len(y), interval=dt*1000, blit=True)
-plt.show()
\ No newline at end of file
+if __name__ == "__main__":
+    args = parse_args()
+    t_stop = args.t_stop
+    if args.benchmark:
+        benchmark()
+    elif args.compare:
+        energy_report(np.radians([th1, w1, th2, w2]), np.arange(0, t_stop, args.dt), args.dt, args.rtol)
+    elif args.flip_map:
+        start = time.perf_counter()
+        times, _, _ = flip_time_map(args.size, args.t_max, args.dt, args.processes)
+        save_flip_map(args.flip_map, times)
+        print(f"{args.size}x{args.size} flip-time map in {time.perf_counter() - start:.1f} s, "
+              f"{np.isfinite(times).mean():.1%} flipped within {args.t_max:g} s -> {args.flip_map}")
+    elif args.lyapunov:
+        # initial angles spread by up to 1e-3 rad around the configured state
+        rng = np.random.default_rng(0)
+        states = np.radians([th1, w1, th2, w2]) + rng.normal(scale=1e-3, size=(args.lyapunov, 4)) * [1, 0, 1, 0]
+        exponents = lyapunov_exponents(states, t_stop, args.dt)
+        print(f"largest Lyapunov exponent over {t_stop:g} s: mean {exponents.mean():.3f} /s, "
+              f"std {exponents.std():.3f} /s, range {exponents.min():.3f} .. {exponents.max():.3f} /s")
+    else:
+        main(args.method, args.dt, None if args.fixed else args.rtol, args.precompute)
@@ -1,24 +1,34 @@
 
  
+import os
+import re
+import argparse
+import functools
 import numpy as np
 import matplotlib.pyplot as plt 
 from matplotlib.pyplot import *
+from matplotlib import animation
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 import scipy.integrate as integrate
  
-fig = figure(figsize=(7, 7), dpi=120)
- 
  
  
 # Function that will convert any given function 'f' defined in a given range '[li,lf]' to a periodic function of period 'lf-li' 
+# 'x' may be a number or an array; it is wrapped into '[li,lf)' with one modulo, whatever its distance from the range
 def periodicf(li,lf,f,x):
-    if x>=li and x<=lf :
-        return f(x)
-    elif x>lf:
-        x_new=x-(lf-li)
-        return periodicf(li,lf,f,x_new)
-    elif x<(li):
-        x_new=x+(lf-li)
-        return periodicf(li,lf,f,x_new)
+    x = li + np.mod(np.asarray(x, dtype=float) - li, lf - li)
+    return sampleFunction(f, x) if x.ndim else f(float(x))
+ 
+# Values of 'f' at every element of the array 'x'. Vectorized functions are called once;
+# functions that only take scalars are called per element.
+def sampleFunction(f, x):
+    try:
+        y = np.asarray(f(x), dtype=float)
+        if y.shape == x.shape:
+            return y
+    except (TypeError, ValueError):
+        pass
+    return np.array([f(xi) for xi in x.ravel()], dtype=float).reshape(x.shape)
  
 # The periodic version of sawtooth function 
 def sawtoothP(li,lf,x):
@@ -34,10 +44,7 @@ def squareP(li,lf,x):
  
 # Non-periodic square wave function defined for a range [-l,l]
 def square(x):
-    if x>0:
-        return np.pi
-    else:
-        return -np.pi
+    return np.where(x>0, np.pi, -np.pi)
  
 # The periodic version of triangle function
 def triangleP(li,lf,x):
@@ -45,10 +52,7 @@ def triangleP(li,lf,x):
  
 # Non-periodic triangle wave function defined for a range [-l,l]
 def triangle(x):
-    if x>0:
-        return x
-    else:
-        return -x
+    return np.abs(x)
  
 # The periodic version of cycloid function
 def cycloidP(li,lf,x):
@@ -74,120 +78,343 @@ def fourierCoeffs(li, lf, n, f):
  
     return [a0/2.0, A, B]
  
-# This functions returns the value of the Fourier series for a given value of x given the already calculated Fourier coefficients
+# Samples per period for the FFT coefficients; raised to at least 8 per harmonic
+fftSamples = 4096
+ 
+# All cosine and sine coefficients of 'f' over '[li,lf]' from a single real FFT of
+# 'samples' values taken at the midpoints of equal cells. This is the midpoint rule
+# applied to every harmonic at once, and jumps at the ends or the middle of the
+# range fall on cell edges. The result is cached per (interval, function, samples),
+# so every n below samples/2 reuses the same transform.
+@functools.lru_cache(maxsize=64)
+def fourierSpectrum(li, lf, f, samples):
+    h = (lf-li)/samples
+    x = li + (np.arange(samples) + 0.5)*h
+    a0, A, B = sampleSpectrum(sampleFunction(f, x), x[0], (lf-li)/2)
+    A.flags.writeable = B.flags.writeable = False
+    return a0, A, B
+ 
+# Constant term and the cosine and sine coefficients below the Nyquist harmonic of one period
+# of equally spaced samples 'y', the first taken at 'x0', of a function with half-period 'l'
+def sampleSpectrum(y, x0, l):
+    F = np.fft.rfft(y)[:len(y)//2]
+    k = np.arange(len(F))
+    # shift the transform from the sample grid to the series' origin x = 0
+    C = 2/len(y)*np.exp(1j*k*np.pi*x0/l)*np.conj(F)
+    return C[0].real/2.0, C.real[1:], C.imag[1:]
+ 
+# Same result as fourierCoeffs, from the cached FFT spectrum instead of 2n+1 quad calls
+def fourierCoeffsFFT(li, lf, n, f, samples=None):
+    if samples is None:
+        samples = max(fftSamples, 1 << int(np.ceil(np.log2(8*n))))
+    if n >= samples//2:
+        raise ValueError(f"{samples} samples resolve at most {samples//2 - 1} harmonics")
+    a0, A, B = fourierSpectrum(li, lf, f, samples)
+    return [a0, A[:n], B[:n]]
+ 
+# Largest difference between the FFT and quad coefficients of 'f' up to harmonic 'n'
+def compareCoeffs(li, lf, n, f, samples=None):
+    quad = fourierCoeffs(li, lf, n, f)
+    fft = fourierCoeffsFFT(li, lf, n, f, samples)
+    return max(abs(quad[0]-fft[0]), np.max(np.abs(quad[1]-fft[1])), np.max(np.abs(quad[2]-fft[2])))
+ 
+# This functions returns the value of the Fourier series for a given value (or array) of x given the already calculated Fourier coefficients
 def fourierSeries(coeffs,x,l,n):
-    value = coeffs[0]
-    for i in range(1,n+1):
-        value = value + coeffs[1][i-1]*np.cos(i*np.pi*x/l) +  coeffs[2][i-1]*np.sin(i*np.pi*x/l)
-    return value
-     
- 
+    theta = np.pi*np.asarray(x, dtype=float)/l
+    return coeffs[0] + seriesRecurrence(np.asarray(coeffs[1][:n]), np.asarray(coeffs[2][:n]), theta)
+ 
+# Sum of A[k-1]*cos(k*theta) + B[k-1]*sin(k*theta) over k as the real part of the polynomial
+# sum (A[k-1] - i*B[k-1])*z**k at z = exp(i*theta), evaluated by Horner's recurrence from the
+# highest harmonic down. Each harmonic costs one multiply-add over the whole array and no
+# cos/sin calls, memory stays at a few arrays the size of theta, and on |z| = 1 the
+# rounding error grows only linearly with the number of harmonics.
+def seriesRecurrence(A, B, theta):
+    z = np.exp(1j*theta)
+    total = np.zeros_like(z)
+    for c in (A - 1j*B)[::-1]:
+        total += c
+        total *= z
+    return total.real
+ 
+# Waveforms the animation can show: function, title, colour of the wave and colour of its approximation
+waves = {
+    'sawtooth': (sawtooth, 'Sawtooth Wave', 'darkkhaki', 'forestgreen'),
+    'square': (square, 'Square Wave', 'tomato', 'maroon'),
+    'triangle': (triangle, 'Triangular Wave', 'orange', 'darkgoldenrod'),
+    'cycloid': (cycloid, 'Cycloid', 'slateblue', 'teal'),
+}
+ 
+# Width of the scrolling view and how far ahead of the newest point its right edge sits
+viewWidth = 14
+viewLead = 1
+framesPerSecond = 60
+ 
+# Figure, frame function and frame list tracing 'wave' and its Fourier approximation for n = 1..nMax,
+# 'pointsPerFrame' points at a time. Every curve is computed up front into preallocated arrays and the
+# two lines are persistent artists: each frame only hands them views of the points inside the view,
+# so its cost does not grow with the number of points already drawn.
+# With scroll=True the view follows the newest point; otherwise it shows the whole range and
+# the lines and the n label are the only animated artists, so they can be blitted.
+def seriesFrames(wave, nMax=9, li=-np.pi, lf=np.pi, x=None, pointsPerFrame=1, scroll=True):
+    f, name, waveColor, seriesColor = waves[wave]
+    l = (lf-li)/2.0
+    if x is None:
+        x = np.arange(-np.pi*2, np.pi*2, 0.05)
+    y = periodicf(li,lf,f,x)
+    ySeries = np.empty((nMax, x.size))
+    for n in range(1, nMax+1):
+        ySeries[n-1] = fourierSeries(fourierCoeffsFFT(li,lf,n,f),x,l,n)
+ 
+    fig, ax = plt.subplots(figsize=(7, 7), dpi=120)
+    ax.set_title('Fourier Series Approximation\n'+name)
+    waveLine, = ax.plot([], [], c=waveColor, label=name, animated=not scroll)
+    seriesLine, = ax.plot([], [], c=seriesColor, label='Fourier Approximation', animated=not scroll)
+    label = ax.text(0.03, 0.97, '', transform=ax.transAxes, va='top', animated=not scroll)
+    ax.legend(loc='upper right')
+    ax.set_ylim(-6,7)
+    if scroll:
+        visible = int(np.ceil(viewWidth/(x[1]-x[0]))) + 1
+    else:
+        visible = x.size
+        ax.set_xlim(x[0], x[-1])
+ 
+    ends = list(range(pointsPerFrame, x.size, pointsPerFrame)) + [x.size]
+    frames = [(n, end) for n in range(nMax) for end in ends]
+ 
+    def update(frame):
+        n, end = frame
+        start = max(0, end-visible)
+        waveLine.set_data(x[start:end], y[start:end])
+        seriesLine.set_data(x[start:end], ySeries[n, start:end])
+        label.set_text('n = '+str(n+1))
+        if scroll:
+            ax.set_xlim(x[end-1]+viewLead-viewWidth, x[end-1]+viewLead)
+        return waveLine, seriesLine, label
+ 
+    return fig, update, frames
+ 
+# Interactive animation of seriesFrames; blitted unless the view scrolls, since moving
+# the limits redraws the tick labels and so the whole axes anyway
+def seriesAnimation(wave, scroll=True, fps=framesPerSecond, **kwargs):
+    fig, update, frames = seriesFrames(wave, scroll=scroll, **kwargs)
+    anim = animation.FuncAnimation(fig, update, frames=frames, interval=1000/fps,
+                                   blit=not scroll, repeat=False, cache_frame_data=False)
+    return fig, anim
+ 
+# Writes the frames of an animation without opening a window: '.gif' through Pillow, which
+# holds every frame in memory until the end, other video formats through ffmpeg, and any
+# other path as a directory of numbered PNG frames. The figure is rendered on its own Agg
+# canvas whatever the pyplot backend, so frames never go through a GUI toolkit; building
+# the figure without a display still needs a non-interactive backend such as Agg.
+def exportAnimation(path, fig, update, frames, fps=framesPerSecond):
+    FigureCanvasAgg(fig)
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.gif':
+        writer = animation.PillowWriter(fps=fps)
+    elif extension in ('.mp4', '.mkv', '.mov', '.avi', '.webm'):
+        if not animation.writers.is_available('ffmpeg'):
+            raise RuntimeError('writing '+extension+' needs ffmpeg; save a .gif or a frame directory instead')
+        writer = animation.FFMpegWriter(fps=fps)
+    else:
+        os.makedirs(path, exist_ok=True)
+        for i, frame in enumerate(frames):
+            update(frame)
+            fig.savefig(os.path.join(path, 'frame_%05d.png' % i))
+        plt.close(fig)
+        return len(frames)
+    with writer.saving(fig, path, fig.dpi):
+        for frame in frames:
+            update(frame)
+            writer.grab_frame()
+    plt.close(fig)
+    return len(frames)
+ 
+# Points a closed path is resampled to, which is also the number of rotating vectors
+epicycleSamples = 2048
+# Largest circles drawn; every vector is still summed and drawn as an arm
+epicycleCircles = 100
+circleSegments = 48
+# Seconds per trip round the path
+epicyclePeriod = 10
+# Star drawn when no path is given, as an SVG-style point list
+samplePath = "0,100 22,31 95,31 36,-12 59,-81 0,-38 -59,-81 -36,-12 -95,31 -22,31"
+ 
+# (N, 2) array of the numbers in 'text' taken in pairs, so SVG polygon points ("x1,y1 x2,y2 ...")
+# and text files with an x and a y column both work
+def parsePoints(text):
+    numbers = re.findall(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?', text)
+    if len(numbers) < 6 or len(numbers) % 2:
+        raise ValueError('a path needs at least three x,y pairs')
+    return np.array(numbers, dtype=float).reshape(-1, 2)
+ 
+def loadPath(path):
+    if os.path.splitext(path)[1] == '.npy':
+        return np.load(path)
+    with open(path) as file:
+        return parsePoints(file.read())
+ 
+# The closed polygon through 'points' as 'samples' complex points equally spaced along its
+# length, so the DFT spends its terms on the shape and not on how densely it was drawn
+def resamplePath(points, samples=epicycleSamples):
+    points = np.asarray(points, dtype=float)
+    z = np.append(points[:, 0] + 1j*points[:, 1], points[0, 0] + 1j*points[0, 1])
+    z = z[np.append(True, np.abs(np.diff(z)) > 0)]
+    length = np.append(0, np.cumsum(np.abs(np.diff(z))))
+    s = np.arange(samples)*length[-1]/samples
+    return np.interp(s, length, z.real) + 1j*np.interp(s, length, z.imag)
+ 
+# Frequencies and coefficients of the path's DFT: the path is the sum over k of
+# c[k]*exp(2*pi*i*k*t) for t in [0, 1). The constant term comes first, as the fixed centre,
+# then the rotating terms by decreasing amplitude, so any prefix is the best reconstruction
+# with that many vectors and the largest circles lead the chain.
+def epicycles(z, terms=None):
+    c = np.fft.fft(z)/len(z)
+    k = np.fft.fftfreq(len(z), 1/len(z))
+    order = 1 + np.argsort(-np.abs(c[1:]), kind='stable')
+    order = np.append(0, order[:terms])
+    return k[order], c[order]
+ 
+# Figure, frame function and frames of the epicycle reconstruction of the closed path
+# through 'points' with 'terms' rotating vectors (all of them by default). Per frame the
+# phasors are evaluated together and chained with one cumulative sum into preallocated
+# arrays; the 'circles' largest are drawn as a single line broken by NaNs.
+def epicycleFrames(points, terms=None, circles=epicycleCircles, fps=framesPerSecond,
+                   period=epicyclePeriod, samples=epicycleSamples, fig=None, ax=None):
+    k, c = epicycles(resamplePath(points, samples), terms)
+    circles = min(circles, len(c)-1)
+    times = np.arange(int(period*fps))/int(period*fps)
+    # the traced curve for the whole trip, one block of frames at a time
+    tips = np.concatenate([np.exp(2j*np.pi*np.multiply.outer(block, k)) @ c
+                           for block in np.array_split(times, max(1, len(times)*len(k)//(1 << 20)))])
+    unit = np.append(np.exp(2j*np.pi*np.arange(circleSegments+1)/circleSegments), np.nan)
+    ringShape = np.abs(c[1:circles+1, None])*unit
+ 
+    if fig is None:
+        fig, ax = plt.subplots(figsize=(7, 7), dpi=120)
+    ax.set_aspect('equal')
+    ax.set_title('Epicycles: '+str(len(c)-1)+' vectors, '+str(circles)+' circles drawn')
+    extent = max(np.abs(tips - c[0]).max()*1.4, 1e-9)
+    ax.set_xlim(c[0].real - extent, c[0].real + extent)
+    ax.set_ylim(c[0].imag - extent, c[0].imag + extent)
+    ringLine, = ax.plot([], [], c='slateblue', lw=0.5, alpha=0.5, animated=True)
+    armLine, = ax.plot([], [], c='teal', lw=0.8, animated=True)
+    traceLine, = ax.plot([], [], c='maroon', lw=1.5, animated=True)
+ 
+    omega = 2j*np.pi*k
+    phasors = np.empty_like(c)
+    joints = np.empty_like(c)
+    rings = np.empty_like(ringShape)
+ 
+    def update(i):
+        np.multiply(omega, times[i], out=phasors)
+        np.exp(phasors, out=phasors)
+        np.multiply(phasors, c, out=phasors)
+        np.cumsum(phasors, out=joints)
+        # circle j is centred on the joint before vector j+1
+        np.add(joints[:circles, None], ringShape, out=rings)
+        ringLine.set_data(rings.real.ravel(), rings.imag.ravel())
+        armLine.set_data(joints.real, joints.imag)
+        traceLine.set_data(tips.real[:i+1], tips.imag[:i+1])
+        return ringLine, armLine, traceLine
+ 
+    return fig, update, range(len(times))
+ 
+# Blitted epicycle animation of 'points', repeating once round the path
+def epicycleAnimation(points, fps=framesPerSecond, **kwargs):
+    fig, update, frames = epicycleFrames(points, fps=fps, **kwargs)
+    anim = animation.FuncAnimation(fig, update, frames=frames, interval=1000/fps,
+                                   blit=True, cache_frame_data=False)
+    return fig, anim
+ 
+# Window to draw a closed curve in with the mouse; releasing the button starts its epicycle
+# animation in the same axes, and pressing again starts a new drawing
+def drawEpicycles(fps=framesPerSecond, **kwargs):
+    fig, ax = plt.subplots(figsize=(7, 7), dpi=120)
+    state = {'points': None, 'stroke': None, 'anim': None}
+ 
+    def reset():
+        ax.clear()
+        ax.set_xlim(-1, 1)
+        ax.set_ylim(-1, 1)
+        ax.set_aspect('equal')
+        ax.set_title('Draw a closed curve with the mouse')
+ 
+    def press(event):
+        if event.inaxes is not ax or event.button != 1:
+            return
+        if state['anim'] is not None:
+            state['anim'].event_source.stop()
+            state['anim'] = None
+        reset()
+        state['points'] = [(event.xdata, event.ydata)]
+        state['stroke'], = ax.plot([event.xdata], [event.ydata], c='maroon', lw=1.5)
+        fig.canvas.draw_idle()
+ 
+    def move(event):
+        if state['points'] is None or event.inaxes is not ax:
+            return
+        state['points'].append((event.xdata, event.ydata))
+        state['stroke'].set_data(*zip(*state['points']))
+        fig.canvas.draw_idle()
+ 
+    def release(event):
+        points, state['points'] = state['points'], None
+        if points is None or len(points) < 3:
+            return
+        ax.clear()
+        ax.plot(*zip(*points, points[0]), c='lightgray', lw=1)
+        _, update, frames = epicycleFrames(points, fps=fps, fig=fig, ax=ax, **kwargs)
+        state['anim'] = animation.FuncAnimation(fig, update, frames=frames, interval=1000/fps,
+                                                blit=True, cache_frame_data=False)
+        fig.canvas.draw_idle()
+ 
+    reset()
+    fig.canvas.mpl_connect('button_press_event', press)
+    fig.canvas.mpl_connect('motion_notify_event', move)
+    fig.canvas.mpl_connect('button_release_event', release)
+    return fig, state
+ 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fourier series approximation of periodic waves")
+    parser.add_argument("--wave", choices=sorted(waves), default='square')
+    parser.add_argument("--n-max", type=int, default=9, help="animate n = 1 .. N harmonics")
+    parser.add_argument("--every", type=int, default=1, metavar="K", help="draw K new points per frame")
+    parser.add_argument("--fixed", action="store_true", help="show the whole range instead of scrolling (blitted)")
+    parser.add_argument("--save", metavar="PATH", help="write a .gif/.mp4 or a directory of PNG frames instead of showing")
+    parser.add_argument("--fps", type=int, default=framesPerSecond)
+    parser.add_argument("--epicycles", nargs="?", const="", metavar="PATH",
+                        help="epicycle mode for a closed path: a point list file (SVG-style pairs, x y columns or .npy), default a star")
+    parser.add_argument("--draw", action="store_true", help="epicycle mode for a curve drawn with the mouse")
+    parser.add_argument("--terms", type=int, help="largest rotating vectors used (default all)")
+    parser.add_argument("--circles", type=int, default=epicycleCircles, help="largest circles drawn")
+    return parser.parse_args()
  
  
 if __name__ == "__main__":
  
     # plt.style.use('dark_background')
     plt.style.use('default')  # Or try other options like 'ggplot', 'classic'
-
-     
  
-    # Limits for the functions
-    li = -np.pi
-    lf = np.pi
-    l = (lf-li)/2.0
- 
-    # Number of harmonic terms
-    n = 1
-    for n in range(1,10):
- 
-        plt.title('Fourier Series Approximation\nSawtooth Wave\n n = '+str(n))
-        # plt.title('Fourier Series Approximation\nSquare Wave\n n = '+str(n))
-        # plt.title('Fourier Series Approximation\nTriangular Wave\n n = '+str(n))
-        # plt.title('Fourier Series Approximation\nCycloid\n n = '+str(n))
-         
-        # Fourier coeffficients for various functions
-        coeffsSawtooth = fourierCoeffs(li,lf,n,sawtooth)
-        coeffsTriangle = fourierCoeffs(li,lf,n,triangle)
-        coeffsSquare = fourierCoeffs(li,lf,n,square)
-        coeffsCycloid = fourierCoeffs(li,lf,n,cycloid)
- 
-     
- 
-     
- 
- 
-        # Step size for plotting
-        step_size = 0.05
- 
-        # Limits for plotting
-        x_l = -np.pi*2
-        x_u = np.pi*2
- 
-        # Sample values of x for plotting
-        x = np.arange(x_l,x_u,step_size)
-        y1 = [sawtoothP(li,lf,xi) for xi in x]
-        y1_fourier = [fourierSeries(coeffsSawtooth,xi,l,n) for xi in x]
-        y2 = [squareP(li,lf,xi) for xi in x]
-        y2_fourier = [fourierSeries(coeffsSquare,xi,l,n) for xi in x]
-        y3 = [triangleP(li,lf,xi) for xi in x]
-        y3_fourier = [fourierSeries(coeffsTriangle,xi,l,n) for xi in x]
-        y4 = [cycloidP(li,lf,xi) for xi in x]
-        y4_fourier = [fourierSeries(coeffsCycloid,xi,l,n) for xi in x]
- 
-        x_plot =[]
-        # Sawtooth
-        y_plot1 = []
-        y_plot1_fourier = []
-        # Square
-        y_plot2 = []
-        y_plot2_fourier = []
-        # Triangle
-        y_plot3 = []
-        y_plot3_fourier = []
-        # Cycloid
-        y_plot4 = []
-        y_plot4_fourier = []
-     
-        x_l_plot = x_l - 13
-        x_u_plot = x_l_plot + 14
-        plt.xlim(x_l_plot,x_u_plot)
-        plt.ylim(-6,7)
- 
-        for i in range(x.size):
-             
-            x_plot.append(x[i])
-            # Actual function values
-            y_plot1.append(y1[i])
-            y_plot2.append(y2[i])
-            y_plot3.append(y3[i])
-            y_plot4.append(y4[i])
-            # Values from fourier series
-            y_plot1_fourier.append(y1_fourier[i])
-            y_plot2_fourier.append(y2_fourier[i])
-            y_plot3_fourier.append(y3_fourier[i])
-            y_plot4_fourier.append(y4_fourier[i])
- 
-            #Sawtooth
-            #plt.plot(x_plot,y_plot1,c='darkkhaki',label='Sawtooth Wave')
-            #plt.plot(x_plot,y_plot1_fourier,c='forestgreen',label='Fourier Approximation')
-            #Square
-            plt.plot(x_plot,y_plot2,c='tomato',label='Square Wave')
-            plt.plot(x_plot,y_plot2_fourier,c='maroon',label='Fourier Approximation')
-            #Triangular
-            #plt.plot(x_plot,y_plot3,c='orange',label = 'Triangular Wave')
-            #plt.plot(x_plot,y_plot3_fourier,c='darkgoldenrod',label='Fourier Approximation')
-            #Cycloid
-            # plt.plot(x_plot,y_plot4,c='slateblue',label='Cycloid')
-            # plt.plot(x_plot,y_plot4_fourier,c='teal',label='Fourier Approximation')
-             
-            x_l_plot = x_l_plot + step_size
-            x_u_plot = x_u_plot + step_size
-            plt.xlim(x_l_plot,x_u_plot)
-            plt.pause(0.001)
-            if i==0:
-                plt.legend()
- 
-         
-        plt.clf()
-     
-    plt.show()
+    args = parse_args()
+    if args.save:
+        plt.switch_backend('Agg')
+    if args.draw:
+        fig, state = drawEpicycles(fps=args.fps, terms=args.terms, circles=args.circles)
+        plt.show()
+    elif args.epicycles is not None:
+        points = loadPath(args.epicycles) if args.epicycles else parsePoints(samplePath)
+        options = dict(terms=args.terms, circles=args.circles, fps=args.fps)
+        if args.save:
+            count = exportAnimation(args.save, *epicycleFrames(points, **options), fps=args.fps)
+            print('wrote '+str(count)+' frames to '+args.save)
+        else:
+            fig, anim = epicycleAnimation(points, **options)
+            plt.show()
+    else:
+        options = dict(nMax=args.n_max, pointsPerFrame=args.every, scroll=not args.fixed)
+        if args.save:
+            count = exportAnimation(args.save, *seriesFrames(args.wave, **options), fps=args.fps)
+            print('wrote '+str(count)+' frames to '+args.save)
+        else:
+            fig, anim = seriesAnimation(args.wave, fps=args.fps, **options)
+            plt.show()
@@ -0,0 +1,252 @@
+import os
+import time
+import argparse
+from collections import namedtuple
+import numpy as np
+import matplotlib.pyplot as plt
+
+from Fourier_Serier_Visualizer import (waves, fourierCoeffsFFT, sampleFunction,
+                                       sampleSpectrum, seriesRecurrence)
+
+# Convergence of Fourier partial sums S_n for n up to thousands of harmonics.
+# A source is either a function of x over one period [li, lf) or an array of
+# equally spaced samples of one period, the first taken at li. Its coefficients
+# are computed once, up to the largest n, and every partial sum is built from
+# that one set and evaluated over the whole grid of x at a time.
+
+analysisNMax = 2048
+# FFT samples per harmonic for function sources. The midpoint-rule coefficient
+# of harmonic k is off by about (pi*k/N)**2/6 relatively, 4e-4 at k = N/64.
+analysisOversampling = 64
+# Evaluation points per harmonic; with the parabolic refinement in _peak the
+# Gibbs overshoot of S_nMax comes out within ~0.03% of the jump
+analysisGridDensity = 16
+# A step between neighbouring grid values is a jump when it exceeds this fraction
+# of the function's range and jumpMedianFactor times the median step
+jumpFraction = 0.1
+jumpMedianFactor = 10
+
+# Per harmonic count n: L2 and max-norm errors over one period, largest overshoot
+# past a jump as a fraction of the jump (nan without jumps) and the slope of
+# log|c_k| against log k for k in [n/2, n]; jumps holds the jump positions.
+Convergence = namedtuple("Convergence", "n l2 linf overshoot decay jumps")
+
+
+# Smoothing factors for harmonics 1..n: 'fejer' averages the partial sums S_0..S_n,
+# 'lanczos' multiplies harmonic k by sinc(k/(n+1))
+def sigmaFactors(n, smoothing):
+    k = np.arange(1, n+1)
+    if smoothing == 'fejer':
+        return 1 - k/(n+1)
+    if smoothing == 'lanczos':
+        return np.sinc(k/(n+1))
+    raise ValueError("unknown smoothing "+repr(smoothing))
+
+
+# Coefficients up to nMax, the evaluation grid and the source's values on it.
+# Functions are sampled at cell midpoints, so jumps at cell edges are never hit;
+# sampled data is compared on its own grid.
+def prepareSource(source, li, lf, nMax, gridPoints=None):
+    if callable(source):
+        samples = analysisOversampling << int(np.ceil(np.log2(nMax+1)))
+        coeffs = fourierCoeffsFFT(li, lf, nMax, source, samples)
+        gridPoints = gridPoints or analysisGridDensity*nMax
+        x = li + (np.arange(gridPoints) + 0.5)*(lf-li)/gridPoints
+        return coeffs, x, sampleFunction(source, x)
+    y = np.asarray(source, dtype=float)
+    if nMax >= len(y)//2:
+        raise ValueError(f"{len(y)} samples resolve at most {len(y)//2 - 1} harmonics")
+    x = li + np.arange(len(y))*(lf-li)/len(y)
+    a0, A, B = sampleSpectrum(y, li, (lf-li)/2)
+    return [a0, A[:nMax], B[:nMax]], x, y
+
+
+# Partial sums S_n(x), optionally smoothed, for the increasing harmonic counts 'ns'.
+# Plain and Fejer sums come from one pass over the harmonics that adds a term per
+# harmonic and yields each requested n on the way, so all of them together cost
+# as much as the largest; Lanczos factors depend on n, so those are summed per n.
+def partialSums(coeffs, x, l, ns, smoothing=None):
+    theta = np.pi*np.asarray(x, dtype=float)/l
+    if smoothing is not None and smoothing != 'fejer':
+        for n in ns:
+            sigma = sigmaFactors(n, smoothing)
+            yield n, coeffs[0] + seriesRecurrence(coeffs[1][:n]*sigma, coeffs[2][:n]*sigma, theta)
+        return
+    z = np.exp(1j*theta)
+    power = np.ones_like(z)
+    total = np.full_like(z, coeffs[0])
+    # running sum of S_0..S_k for the Fejer means
+    running = total.real.copy()
+    wanted = iter(ns)
+    n = next(wanted)
+    for k in range(1, ns[-1]+1):
+        power *= z
+        total += (coeffs[1][k-1] - 1j*coeffs[2][k-1])*power
+        if smoothing:
+            running += total.real
+        if k == n:
+            yield n, running/(n+1) if smoothing else total.real.copy()
+            n = next(wanted, None)
+
+
+# Grid indices i where the periodic sequence y jumps between y[i] and y[i+1]
+def findJumps(y):
+    step = np.abs(np.diff(y, append=y[0]))
+    return np.flatnonzero((step > jumpFraction*np.ptp(y)) & (step > jumpMedianFactor*np.median(step)))
+
+
+# Jumps as runs of consecutive grid steps in the same direction, as the first
+# index and the number of steps of each run. A sample taken on a discontinuity,
+# such as the midpoint value of sign(x) at 0, splits the jump into two steps that
+# belong together; runs may wrap around the end of the period.
+def groupJumps(y, jumps):
+    size = len(y)
+    if len(jumps) == 0:
+        return jumps, jumps
+    direction = np.sign(y[(jumps+1) % size] - y[jumps])
+    # jumps[k] and jumps[k+1] are one run
+    joined = ((np.roll(jumps, -1) - jumps) % size == 1) & (np.roll(direction, -1) == direction)
+    if joined.all():
+        joined[:] = False
+    starts = np.flatnonzero(~np.roll(joined, 1))
+    ends = np.flatnonzero(~joined)
+    if ends[0] < starts[0]:
+        ends = np.roll(ends, -1)
+    return jumps[starts], (jumps[ends] - jumps[starts]) % size + 1
+
+
+# For each run of jump steps, the grid indices from halfway to the previous run up
+# to its first step and from its last step to halfway to the next run, ordered as
+# (side of the larger limit, side of the smaller limit), and the combined size of
+# the jump
+def _jumpWindows(y, first, length):
+    size = len(y)
+    last = first + length - 1
+    windows = []
+    for j, (i, k) in enumerate(zip(first, last)):
+        before = (i - last[j-1]) % size or size
+        after = (first[(j+1) % len(first)] - k) % size or size
+        left = np.arange(i - max(before//2, 1) + 1, i + 1) % size
+        right = np.arange(k + 1, k + max(after//2, 1) + 1) % size
+        jump = y[(k+1) % size] - y[i]
+        windows.append((right, left, jump) if jump > 0 else (left, right, -jump))
+    return windows
+
+
+# How far the partial sum overshoots the function on the high side of each jump,
+# or undershoots it on the low side, as a fraction of the jump; the largest over
+# all jumps. Measuring against the function rather than the limit values keeps a
+# sloping function from counting as overshoot. Negative when the sum stays on the
+# near side of the function, as Fejer means always do.
+def overshoot(s, y, windows):
+    if not windows:
+        return np.nan
+    return max(max(_peak(s[high] - y[high]), _peak(y[low] - s[low]))/size
+               for high, low, size in windows)
+
+
+def _peak(values):
+    # largest value, refined by the parabola through the grid maximum and its neighbours
+    # (the grid alone misses the top of a Gibbs peak by ~0.2% of the jump)
+    m = int(np.argmax(values))
+    if m == 0 or m == len(values) - 1:
+        return values[m]
+    before, peak, after = values[m-1:m+2]
+    curvature = before - 2*peak + after
+    return peak - (after - before)**2/(8*curvature) if curvature < 0 else peak
+
+
+# Local decay exponent p in |c_k| ~ k**p: least-squares slope of log|c_k| against
+# log k over k in [n/2, n], skipping coefficients that vanish by symmetry
+def decayRates(coeffs, ns):
+    amplitude = np.hypot(coeffs[1], coeffs[2])
+    nonzero = amplitude > 1e-12*amplitude.max()
+    rates = np.full(len(ns), np.nan)
+    for j, n in enumerate(ns):
+        k = np.arange(max(1, n//2), n+1)
+        k = k[nonzero[k-1]]
+        if len(k) > 1:
+            rates[j] = np.polyfit(np.log(k), np.log(amplitude[k-1]), 1)[0]
+    return rates
+
+
+# Convergence of the partial sums of 'source' for the harmonic counts 'ns'
+# (by default about 40 counts spaced geometrically up to nMax)
+def convergence(source, li=-np.pi, lf=np.pi, nMax=analysisNMax, ns=None, smoothing=None, gridPoints=None):
+    if ns is None:
+        ns = np.geomspace(1, nMax, 40).round()
+    ns = np.unique(np.asarray(ns, dtype=int))
+    if ns[0] < 1:
+        raise ValueError("harmonic counts start at 1")
+    coeffs, x, y = prepareSource(source, li, lf, int(ns[-1]), gridPoints)
+    first, length = groupJumps(y, findJumps(y))
+    windows = _jumpWindows(y, first, length)
+    l2, linf, over = (np.empty(len(ns)) for _ in range(3))
+    for j, (n, s) in enumerate(partialSums(coeffs, x, (lf-li)/2, ns, smoothing)):
+        error = s - y
+        l2[j] = np.sqrt(np.mean(error**2)*(lf-li))
+        linf[j] = np.abs(error).max()
+        over[j] = overshoot(s, y, windows)
+    # each jump is placed in the middle of its run, wrapped into the period
+    h = x[1] - x[0]
+    jumps = (x[first] + h*length/2 - x[0]) % (lf-li) + x[0]
+    return Convergence(ns, l2, linf, over, decayRates(coeffs, ns), jumps)
+
+
+def plotConvergence(results, title, path=None):
+    fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=(15, 4.5))
+    for name, result in results.items():
+        line, = ax1.loglog(result.n, result.l2, label=name+' L2')
+        ax1.loglog(result.n, result.linf, '--', c=line.get_color(), label=name+' max')
+        if not np.all(np.isnan(result.overshoot)):
+            ax2.semilogx(result.n, 100*result.overshoot, c=line.get_color(), label=name)
+        ax3.semilogx(result.n, result.decay, '.-', c=line.get_color(), label=name)
+    ax1.set_xlabel('harmonics n')
+    ax1.set_ylabel('error of S_n')
+    ax1.set_title('L2 (solid) and max (dashed) error')
+    ax2.set_xlabel('harmonics n')
+    ax2.set_ylabel('overshoot (% of jump)')
+    ax2.set_title('Gibbs overshoot')
+    ax3.set_xlabel('harmonics n')
+    ax3.set_ylabel('p in |c_k| ~ k^p')
+    ax3.set_title('Coefficient decay over [n/2, n]')
+    for ax in (ax1, ax2, ax3):
+        if ax.lines:
+            ax.legend(fontsize=8)
+    fig.suptitle(title)
+    fig.tight_layout()
+    if path:
+        fig.savefig(path, dpi=120)
+    else:
+        plt.show()
+
+
+def loadSamples(path):
+    return np.load(path) if os.path.splitext(path)[1] == '.npy' else np.loadtxt(path)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convergence of Fourier partial sums")
+    parser.add_argument("--waves", nargs="*", choices=sorted(waves), default=sorted(waves))
+    parser.add_argument("--data", metavar="FILE", help="one period of equally spaced samples (.npy or text)")
+    parser.add_argument("--n-max", type=int, default=analysisNMax)
+    parser.add_argument("--smoothing", choices=("fejer", "lanczos"))
+    parser.add_argument("--output", metavar="FILE", help="save the figure instead of showing it")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    sources = {name: waves[name][0] for name in args.waves}
+    if args.data:
+        sources[os.path.basename(args.data)] = loadSamples(args.data)
+    results = {}
+    for name, source in sources.items():
+        start = time.perf_counter()
+        result = convergence(source, nMax=args.n_max, smoothing=args.smoothing)
+        results[name] = result
+        print(f"{name:>10}: n = {result.n[-1]}  L2 {result.l2[-1]:.3e}  max {result.linf[-1]:.3e}  "
+              f"overshoot {100*result.overshoot[-1]:.2f}%  decay k^{result.decay[-1]:.2f}  "
+              f"({time.perf_counter() - start:.2f} s)")
+    plotConvergence(results, 'Fourier partial sums' + (', '+args.smoothing+' smoothing' if args.smoothing else ''),
+                    args.output)
@@ -1,192 +1,895 @@
+import time
+import heapq
+import argparse
+from collections import namedtuple
 import pygame
 import numpy as np
-import pygame_gui
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+from trajectory import TrajectoryReader, TrajectoryWriter
 
-# Initialize simulation variables
+# Default simulation variables
 width, height = 800, 600  # Simulation area dimensions
 num_particles = 100  # Initial number of particles
 temperature = 300  # Kelvin (controls particle speed)
 particle_radius = 5
 particle_mass = 1e-26  # Approximate mass of a gas particle (kg)
 k_B = 1.38e-23  # Boltzmann constant
-
-# Calculate initial particle speed based on temperature
-particle_speed = np.sqrt(3 * k_B * temperature / particle_mass)
-
-# Initialize pygame
-pygame.init()
-screen = pygame.display.set_mode((width + 300, height))  # Extra space for side panel
-pygame.display.set_caption("Gas Lab Simulator")
-font = pygame.font.SysFont(None, 24)
-clock = pygame.time.Clock()
-
-# Initialize pygame_gui
-manager = pygame_gui.UIManager((width + 300, height))
-
-# Side panel layout
-panel_x = width + 10
-panel_y = 10
-slider_width = 280
-slider_height = 20
-label_height = 30
-
-# Sliders for controlling particles, temperature, and container size
-particle_slider = pygame_gui.elements.UIHorizontalSlider(
-    relative_rect=pygame.Rect((panel_x, panel_y + label_height), (slider_width, slider_height)),
-    start_value=num_particles,
-    value_range=(10, 500),
-    manager=manager
-)
-
-temperature_slider = pygame_gui.elements.UIHorizontalSlider(
-    relative_rect=pygame.Rect((panel_x, panel_y + 2 * label_height + slider_height), (slider_width, slider_height)),
-    start_value=temperature,
-    value_range=(100, 500),
-    manager=manager
-)
-
-width_slider = pygame_gui.elements.UIHorizontalSlider(
-    relative_rect=pygame.Rect((panel_x, panel_y + 3 * label_height + 2 * slider_height), (slider_width, slider_height)),
-    start_value=width,
-    value_range=(400, 1000),
-    manager=manager
-)
-
-height_slider = pygame_gui.elements.UIHorizontalSlider(
-    relative_rect=pygame.Rect((panel_x, panel_y + 4 * label_height + 3 * slider_height), (slider_width, slider_height)),
-    start_value=height,
-    value_range=(300, 800),
-    manager=manager
-)
-
-# Labels for sliders
-particle_label = pygame_gui.elements.UILabel(
-    relative_rect=pygame.Rect((panel_x, panel_y), (slider_width, label_height)),
-    text="Number of Particles",
-    manager=manager
-)
-
-temperature_label = pygame_gui.elements.UILabel(
-    relative_rect=pygame.Rect((panel_x, panel_y + label_height + slider_height), (slider_width, label_height)),
-    text="Temperature (K)",
-    manager=manager
-)
-
-width_label = pygame_gui.elements.UILabel(
-    relative_rect=pygame.Rect((panel_x, panel_y + 2 * (label_height + slider_height)), (slider_width, label_height)),
-    text="Container Width",
-    manager=manager
-)
-
-height_label = pygame_gui.elements.UILabel(
-    relative_rect=pygame.Rect((panel_x, panel_y + 3 * (label_height + slider_height)), (slider_width, label_height)),
-    text="Container Height",
-    manager=manager
-)
-
-# Function to calculate speed of a particle
-def calculate_speed(velocity):
-    return np.linalg.norm(velocity)
-
-# Function to draw real-time histogram for speed distribution
-def draw_speed_distribution(particles):
-    speeds = [calculate_speed(p["vel"]) for p in particles]
-    fig, ax = plt.subplots(figsize=(4, 4), dpi=100)
-    ax.hist(speeds, bins=10, color='blue', edgecolor='black')
-    ax.set_title("Speed Distribution")
-    ax.set_xlabel("Speed")
-    ax.set_ylabel("Frequency")
-    canvas = FigureCanvas(fig)
-    canvas.draw()
-    buf = canvas.buffer_rgba()
-    raw_data = np.asarray(buf)
-    plt.close(fig)
-    surface = pygame.image.frombuffer(raw_data, canvas.get_width_height(), 'RGBA')
-    return pygame.transform.scale(surface, (280, 280))
-
-# Function to handle particle-wall collisions
-def handle_wall_collisions(particle, width, height):
-    if particle["pos"][0] <= 0 or particle["pos"][0] >= width:
-        particle["vel"][0] *= -1
-    if particle["pos"][1] <= 0 or particle["pos"][1] >= height:
-        particle["vel"][1] *= -1
-
-# Main simulation loop
-running = True
-frame_count = 0
-particles = [
-    {"pos": np.array([np.random.uniform(0, width), np.random.uniform(0, height)]),
-     "vel": np.random.uniform(-particle_speed, particle_speed, size=2)}
-    for _ in range(num_particles)
+time_step = 0.01  # Simulated seconds per frame
+
+# Particle-particle collisions: "cells" resolves overlapping pairs found with a
+# cell list after every step, "events" runs exact event-driven dynamics from a
+# priority queue of predicted collision times, "off" only bounces off walls
+collision_mode = "cells"
+
+# Thermostat driving the gas to the set temperature: "rescale" scales all
+# velocities towards it (Berendsen), "andersen" re-draws random particles from
+# the Maxwell-Boltzmann distribution, "none" leaves the energy untouched
+thermostat = "rescale"
+
+# Particle species: each particle stores its own mass and radius, copied from its species
+Species = namedtuple("Species", "name mass radius color")
+single_gas = [Species("Gas", particle_mass, particle_radius, (0, 255, 255))]
+gas_mixture = [
+    Species("Light", particle_mass, particle_radius, (0, 255, 255)),
+    Species("Heavy", 4 * particle_mass, 8, (255, 160, 0)),
 ]
 
-# Initialize histogram
-histogram = draw_speed_distribution(particles)
-
-while running:
-    time_delta = clock.tick(60) / 1000.0  # Time in seconds since last tick
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        manager.process_events(event)
-
-    # Update variables from sliders
-    num_particles = int(particle_slider.get_current_value())
-    temperature = int(temperature_slider.get_current_value())
-    new_width = int(width_slider.get_current_value())
-    new_height = int(height_slider.get_current_value())
-
-    # Recalculate particle speed based on updated temperature
-    particle_speed = np.sqrt(3 * k_B * temperature / particle_mass)
-
-    # Adjust the number of particles
-    while len(particles) < num_particles:
-        particles.append({
-            "pos": np.array([np.random.uniform(0, width), np.random.uniform(0, height)]),
-            "vel": np.random.uniform(-particle_speed, particle_speed, size=2)
-        })
-    while len(particles) > num_particles:
-        particles.pop()
-
-    # Adjust container size and reposition particles if necessary
-    if new_width != width or new_height != height:
-        width, height = new_width, new_height
-        screen = pygame.display.set_mode((width + 300, height))
-        for particle in particles:
-            particle["pos"] = np.array([np.random.uniform(0, width), np.random.uniform(0, height)])
-
-    # Clear the screen
-    screen.fill((0, 0, 0))
-
-    # Draw simulation area border
-    pygame.draw.rect(screen, (255, 255, 255), (0, 0, width, height), 2)
-
-    # Update particle positions and draw them
-    for particle in particles:
-        particle["pos"] += particle["vel"] * 0.01  # Time step scaling
-        handle_wall_collisions(particle, width, height)
-        pygame.draw.circle(screen, (0, 255, 255), particle["pos"].astype(int), particle_radius)
-
-    # Calculate and display pressure
-    pressure = len(particles) * particle_mass * particle_speed**2 / (3 * width * height)
-
-    # Side panel for data
-    pygame.draw.rect(screen, (50, 50, 50), (width, 0, 300, height))  # Side panel background
-    screen.blit(font.render(f"Temperature: {temperature} K", True, (255, 255, 255)), (panel_x, panel_y))
-    screen.blit(font.render(f"Particles: {len(particles)}", True, (255, 255, 255)), (panel_x, panel_y + label_height + slider_height))
-    screen.blit(font.render(f"Pressure: {pressure:.2e} Pa", True, (255, 255, 255)), (panel_x, panel_y + 2 * (label_height + slider_height)))
-
-    # Update histogram every 20 frames
-    if frame_count % 20 == 0:
-        histogram = draw_speed_distribution(particles)
-    screen.blit(histogram, (panel_x, panel_y + 4 * (label_height + slider_height)))
-
-    manager.update(time_delta)
-    manager.draw_ui(screen)
-
-    pygame.display.flip()
-    frame_count += 1
-
-pygame.quit()
\ No newline at end of file
+# Particle store: every per-particle field lives in a contiguous typed array
+# (positions and velocities (N, 2), masses and radii (N,), species ids (N,) int16).
+# The arrays grow geometrically, so adding particles is amortized O(1), and
+# removing one is O(1) by moving the last particle into its slot.
+class ParticleStore:
+    fields = {
+        "positions": ((2,), np.float64),
+        "velocities": ((2,), np.float64),
+        "masses": ((), np.float64),
+        "radii": ((), np.float64),
+        "species": ((), np.int16),
+    }
+
+    def __init__(self, capacity=64):
+        self._arrays = {name: np.zeros((capacity,) + shape, dtype) for name, (shape, dtype) in self.fields.items()}
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def positions(self):
+        return self._arrays["positions"][:self.count]
+
+    @property
+    def velocities(self):
+        return self._arrays["velocities"][:self.count]
+
+    @property
+    def masses(self):
+        return self._arrays["masses"][:self.count]
+
+    @property
+    def radii(self):
+        return self._arrays["radii"][:self.count]
+
+    @property
+    def species(self):
+        return self._arrays["species"][:self.count]
+
+    def reserve(self, capacity):
+        current = len(self._arrays["positions"])
+        if capacity <= current:
+            return
+        capacity = max(capacity, 2 * current)
+        for name, (shape, dtype) in self.fields.items():
+            grown = np.zeros((capacity,) + shape, dtype)
+            grown[:self.count] = self._arrays[name][:self.count]
+            self._arrays[name] = grown
+
+    def add(self, **values):
+        new_count = self.count + len(values["positions"])
+        self.reserve(new_count)
+        for name, value in values.items():
+            self._arrays[name][self.count:new_count] = value
+        self.count = new_count
+
+    # Add particles of randomly chosen species (weighted by fractions) with
+    # velocity components uniform in +/- sqrt(3kT/m), which gives each species
+    # the 2D mean kinetic energy kT
+    def spawn(self, count, width, height, temperature, species_table, fractions=None, rng=np.random):
+        kinds = rng.choice(len(species_table), size=count, p=fractions)
+        masses = np.array([kind.mass for kind in species_table])[kinds]
+        radii = np.array([kind.radius for kind in species_table], dtype=float)[kinds]
+        speed = np.sqrt(3 * k_B * temperature / masses)
+        self.add(positions=np.column_stack((rng.uniform(0, width, count), rng.uniform(0, height, count))),
+                 velocities=rng.uniform(-1, 1, size=(count, 2)) * speed[:, None],
+                 masses=masses, radii=radii, species=kinds)
+
+    def remove(self, index):
+        last = self.count - 1
+        for array in self._arrays.values():
+            array[index] = array[last]
+        self.count = last
+
+    def truncate(self, count):
+        self.count = min(self.count, count)
+
+    def speeds(self):
+        return np.hypot(self.velocities[:, 0], self.velocities[:, 1])
+
+# Real-time speed histogram drawn natively with pygame. Bin edges are fixed, so
+# each frame is a single vectorized binning pass plus a few rectangle draws. Bars
+# are stacked per species and each species' theoretical 2D Maxwell-Boltzmann
+# curve for the set temperature is overlaid in its colour.
+class SpeedHistogram:
+    def __init__(self, font, max_speed, species_table, bins=40, size=(280, 280)):
+        self.bins = bins
+        self.bin_width = max_speed / bins
+        self.centers = (np.arange(bins) + 0.5) * self.bin_width
+        self.species_table = species_table
+        self.counts = np.zeros((len(species_table), bins))
+        self.surface = pygame.Surface(size)
+        self.plot = pygame.Rect(10, 30, size[0] - 20, size[1] - 60)
+        self.title = font.render("Speed Distribution", True, (255, 255, 255))
+        self.axis_label = font.render(f"Speed (0 - {max_speed:.0f} m/s)", True, (200, 200, 200))
+
+    def update(self, speeds, species):
+        index = np.minimum((speeds / self.bin_width).astype(np.int64), self.bins - 1)
+        index += species * self.bins
+        self.counts.flat[:] = np.bincount(index, minlength=self.counts.size)
+
+    # Expected particles per bin for a 2D Maxwell-Boltzmann gas:
+    # f(v) = (m v / kT) exp(-m v^2 / 2kT)
+    def expected(self, count, temperature, mass):
+        a = mass / (k_B * temperature)
+        return count * a * self.centers * np.exp(-0.5 * a * self.centers ** 2) * self.bin_width
+
+    def draw(self, temperature):
+        # bars and curves are both stacked, each species on top of the ones before it
+        expected = np.cumsum([self.expected(counts.sum(), temperature, kind.mass)
+                              for counts, kind in zip(self.counts, self.species_table)], axis=0)
+        stacked = np.cumsum(self.counts, axis=0)
+        scale = self.plot.height / max(stacked[-1].max(), expected[-1].max(), 1)
+        bar_width = self.plot.width / self.bins
+        lefts = self.plot.left + (np.arange(self.bins) * bar_width).astype(int)
+
+        self.surface.fill((30, 30, 30))
+        self.surface.blit(self.title, (10, 5))
+        self.surface.blit(self.axis_label, (10, self.plot.bottom + 8))
+        tops = self.plot.bottom - (stacked * scale).astype(int)
+        bottoms = np.vstack((np.full(self.bins, self.plot.bottom), tops[:-1]))
+        for kind, top_row, bottom_row in zip(self.species_table, tops.tolist(), bottoms.tolist()):
+            color = [channel // 2 for channel in kind.color]
+            for left, top, bottom in zip(lefts.tolist(), top_row, bottom_row):
+                if bottom > top:
+                    pygame.draw.rect(self.surface, color, (left, top, max(int(bar_width) - 1, 1), bottom - top))
+        x = self.plot.left + self.centers / self.bin_width * bar_width
+        for kind, curve in zip(self.species_table, expected):
+            points = np.column_stack((x, self.plot.bottom - curve * scale))
+            pygame.draw.lines(self.surface, kind.color, False, points.tolist(), 2)
+        pygame.draw.line(self.surface, (200, 200, 200), self.plot.bottomleft, self.plot.bottomright)
+        return self.surface
+
+# Function to handle particle-wall collisions for all particles at once. Only
+# particles moving further out are reflected, so none get stuck flipping outside a wall.
+# The momentum given to each wall (left, right, top, bottom) is added to wall_impulse;
+# masses is a per-particle array or a single mass for all particles.
+# Besides the per-axis boolean masks, the impulse sums gather only the indices of the
+# particles hitting each wall, so their cost follows the collisions, not the particle count.
+def handle_wall_collisions(positions, velocities, width, height, masses=particle_mass, wall_impulse=None):
+    masses = np.broadcast_to(masses, len(velocities))
+    for axis, limit in ((0, width), (1, height)):
+        low = (positions[:, axis] <= 0) & (velocities[:, axis] < 0)
+        high = (positions[:, axis] >= limit) & (velocities[:, axis] > 0)
+        if wall_impulse is not None:
+            hits = np.flatnonzero(low)
+            wall_impulse[2 * axis] -= 2 * np.dot(masses[hits], velocities[hits, axis])
+            hits = np.flatnonzero(high)
+            wall_impulse[2 * axis + 1] += 2 * np.dot(masses[hits], velocities[hits, axis])
+        velocities[low | high, axis] *= -1
+
+# Function to pre-render the particle sprite used by the batched draw path
+def make_particle_sprite(radius, color):
+    sprite = pygame.Surface((2 * radius + 1, 2 * radius + 1), pygame.SRCALPHA)
+    pygame.draw.circle(sprite, color, (radius, radius), radius)
+    return sprite.convert_alpha()
+
+# Function to draw all particles with a single blits call, one sprite per species
+def draw_particles(screen, sprites, positions, radii, species):
+    corners = (positions - radii[:, None]).astype(int).tolist()
+    screen.blits(zip(map(sprites.__getitem__, species.tolist()), corners), doreturn=False)
+
+# Function to find all pairs of particles closer than a given distance using a cell list.
+# Each pair is returned once, as index arrays (i, j). The neighbour cells are looked up
+# for the particles in cell order, so both the searches and the position reads walk
+# memory in order, and x and y are gathered as separate 1D arrays, which is several
+# times faster than gathering rows of the (N, 2) array.
+def find_close_pairs(positions, distance):
+    if len(positions) < 2:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    cells = np.floor(positions / distance).astype(np.int64)
+    cells -= cells.min(axis=0) - 1
+    rows = cells[:, 1].max() + 2
+    keys = cells[:, 0] * rows + cells[:, 1]
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    x, y = positions[order, 0], positions[order, 1]
+    indices = np.arange(len(positions))
+
+    pairs_i = []
+    pairs_j = []
+    # Own cell plus the four "forward" neighbours, so every pair is seen once
+    for dx, dy in ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1)):
+        target = sorted_keys + (dx * rows + dy)
+        start = np.searchsorted(sorted_keys, target, "left")
+        counts = np.searchsorted(sorted_keys, target, "right") - start
+        total = counts.sum()
+        if total == 0:
+            continue
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        i = np.repeat(indices, counts)
+        j = np.repeat(start, counts) + offsets
+        sep_x, sep_y = x[i] - x[j], y[i] - y[j]
+        keep = sep_x * sep_x + sep_y * sep_y < distance * distance
+        if dx == 0 and dy == 0:
+            keep &= i < j
+        pairs_i.append(order[i[keep]])
+        pairs_j.append(order[j[keep]])
+
+    if not pairs_i:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    return np.concatenate(pairs_i), np.concatenate(pairs_j)
+
+# Function to resolve elastic collisions between hard spheres in place, with
+# per-particle radii and masses. Approaching pairs exchange momentum along the
+# line of centres and overlapping pairs are pushed apart in inverse proportion
+# to their mass. Pairs that share a particle are resolved in rounds of pairs with
+# no particle in common, each pair after every earlier pair it shares a particle
+# with, so energy is conserved exactly and the result matches resolving them one
+# by one. pairs are candidate (i, j) index arrays from find_close_pairs; by
+# default they are searched here. Returns the number of collisions.
+def resolve_particle_collisions(positions, velocities, radii, masses, pairs=None):
+    i, j = pairs if pairs is not None else find_close_pairs(positions, 2 * radii.max())
+    if len(i) == 0:
+        return 0
+    x, y = positions[:, 0], positions[:, 1]
+    dx, dy = x[i] - x[j], y[i] - y[j]
+    distance = dx * dx + dy * dy
+    contact = radii[i] + radii[j]
+    touching = np.flatnonzero((distance > 0) & (distance < contact * contact))
+    i, j, contact = i[touching], j[touching], contact[touching]
+    distance = np.sqrt(distance[touching])
+    normal = np.column_stack((dx[touching], dy[touching])) / distance[:, None]
+    share_i = masses[j] / (masses[i] + masses[j])  # fraction of each exchange taken by particle i
+    share_j = 1 - share_i
+
+    approach = np.einsum("ij,ij->i", velocities[i] - velocities[j], normal)
+    hit = np.flatnonzero(approach < 0)
+    pending = hit
+    while len(pending):
+        # a pending pair goes in this round if it is the earliest pending pair of both its particles
+        a, b = i[pending], j[pending]
+        rank = np.arange(len(pending))
+        earliest = np.full(len(positions), len(pending))
+        np.minimum.at(earliest, a, rank)
+        np.minimum.at(earliest, b, rank)
+        ready = (earliest[a] == rank) & (earliest[b] == rank)
+        k = pending[ready]
+        # earlier rounds may already have turned the pair apart
+        rate = np.minimum(np.einsum("ij,ij->i", velocities[i[k]] - velocities[j[k]], normal[k]), 0)
+        change = 2 * rate[:, None] * normal[k]
+        velocities[i[k]] -= share_i[k, None] * change
+        velocities[j[k]] += share_j[k, None] * change
+        pending = pending[~ready]
+
+    overlap = (contact - distance)[:, None] * normal
+    np.add.at(positions, i, share_i[:, None] * overlap)
+    np.subtract.at(positions, j, share_j[:, None] * overlap)
+    return len(hit)
+
+# Function to choose how many equal substeps a "cells" step of dt needs. The pair
+# check only sees particles that overlap after a move, so no particle may move
+# further than the smallest radius per substep; otherwise approaching pairs pass
+# through each other and the gas stops exchanging energy between particles.
+def collision_substeps(velocities, radii, dt):
+    if len(velocities) == 0:
+        return 1
+    fastest = np.sqrt(np.einsum("ij,ij->i", velocities, velocities).max())
+    return max(1, int(np.ceil(fastest * dt / radii.min())))
+
+# Exact event-driven hard-sphere dynamics. Particles fly freely between events;
+# the next wall bounce or particle collision is taken from a priority queue of
+# predicted times, and events involving a particle that has collided since they
+# were predicted are discarded. Works in place on the position/velocity arrays,
+# with per-particle radii and masses.
+class EventDrivenCollisions:
+    def __init__(self, positions, velocities, radii, masses, width, height, wall_impulse=None):
+        self.positions = positions
+        self.velocities = velocities
+        self.radii = radii
+        self.masses = masses
+        self.width = width
+        self.height = height
+        self.wall_impulse = wall_impulse if wall_impulse is not None else np.zeros(4)
+        self.time = 0.0
+        self.collisions = np.zeros(len(positions), dtype=np.int64)
+        self.queue = []
+        for i in range(len(positions)):
+            self.predict(i, later_only=True)
+
+    def predict(self, i, later_only=False):
+        position, velocity = self.positions[i], self.velocities[i]
+        for axis, limit in ((0, self.width), (1, self.height)):
+            if velocity[axis] > 0:
+                dt = (limit - position[axis]) / velocity[axis]
+            elif velocity[axis] < 0:
+                dt = -position[axis] / velocity[axis]
+            else:
+                continue
+            heapq.heappush(self.queue, (self.time + max(dt, 0.0), i, -1 - axis, self.collisions[i], 0))
+
+        start = i + 1 if later_only else 0
+        dp = self.positions[start:] - position
+        dv = self.velocities[start:] - velocity
+        b = np.einsum("ij,ij->i", dp, dv)
+        dvdv = np.einsum("ij,ij->i", dv, dv)
+        dpdp = np.einsum("ij,ij->i", dp, dp)
+        sigma = self.radii[start:] + self.radii[i]
+        discriminant = b * b - dvdv * (dpdp - sigma * sigma)
+        possible = (b < 0) & (discriminant > 0)
+        if not later_only:
+            possible[i] = False
+        for k in np.flatnonzero(possible):
+            dt = -(b[k] + np.sqrt(discriminant[k])) / dvdv[k]
+            if dt >= 0:
+                j = start + k
+                heapq.heappush(self.queue, (self.time + dt, i, j, self.collisions[i], self.collisions[j]))
+
+    # The thermostat scaled every velocity by factor: all predicted events
+    # still happen, just sooner or later, and their order is unchanged. Stale
+    # events are dropped while the queue is rebuilt.
+    def scale_velocities(self, factor):
+        if factor == 1:
+            return
+        collisions = self.collisions
+        self.queue = [(self.time + (when - self.time) / factor, i, j, seen_i, seen_j)
+                      for when, i, j, seen_i, seen_j in self.queue
+                      if collisions[i] == seen_i and (j < 0 or collisions[j] == seen_j)]
+        heapq.heapify(self.queue)
+
+    # The thermostat gave these particles new velocities: drop their pending
+    # events and predict new ones
+    def velocities_changed(self, indices):
+        for i in indices:
+            self.collisions[i] += 1
+        for i in indices:
+            self.predict(i)
+
+    def drift(self, until):
+        self.positions += self.velocities * (until - self.time)
+        self.time = until
+
+    # Advance the system by dt, processing every event in between. Returns the
+    # number of particle-particle collisions.
+    def advance(self, dt):
+        target = self.time + dt
+        count = 0
+        while self.queue and self.queue[0][0] <= target:
+            when, i, j, seen_i, seen_j = heapq.heappop(self.queue)
+            if self.collisions[i] != seen_i or (j >= 0 and self.collisions[j] != seen_j):
+                continue
+            self.drift(when)
+            if j < 0:
+                axis = -1 - j
+                speed = self.velocities[i, axis]
+                self.wall_impulse[2 * axis + (speed > 0)] += 2 * self.masses[i] * abs(speed)
+                self.velocities[i, axis] *= -1
+                self.collisions[i] += 1
+                self.predict(i)
+                continue
+            normal = (self.positions[j] - self.positions[i]) / (self.radii[i] + self.radii[j])
+            exchange = 2 * np.dot(self.velocities[j] - self.velocities[i], normal) * normal
+            total = self.masses[i] + self.masses[j]
+            self.velocities[i] += self.masses[j] / total * exchange
+            self.velocities[j] -= self.masses[i] / total * exchange
+            self.collisions[i] += 1
+            self.collisions[j] += 1
+            self.predict(i)
+            self.predict(j)
+            count += 1
+        self.drift(target)
+        return count
+
+# Function for the Berendsen velocity-rescaling thermostat: every velocity is
+# scaled by one factor that relaxes the kinetic temperature towards target with
+# time constant tau. Returns the factor.
+def rescale_thermostat(velocities, masses, target, dt, tau=0.1):
+    if len(velocities) == 0:
+        return 1.0
+    current = np.einsum("i,ij,ij->", masses, velocities, velocities) / (2 * len(velocities) * k_B)
+    if current <= 0:
+        return 1.0
+    factor = np.sqrt(max(1 + dt / tau * (target / current - 1), 0.0))
+    velocities *= factor
+    return factor
+
+# Function for the Andersen thermostat: each particle is hit by a "heat bath
+# collision" with probability rate * dt and gets a fresh velocity drawn from the
+# Maxwell-Boltzmann distribution for its mass. Returns the indices that changed.
+def andersen_thermostat(velocities, masses, target, dt, rng, rate=5.0):
+    hit = np.flatnonzero(rng.random(len(velocities)) < rate * dt)
+    velocities[hit] = rng.normal(size=(len(hit), 2)) * np.sqrt(k_B * target / masses[hit])[:, None]
+    return hit
+
+# Exponentially weighted running mean and variance (incremental, Welford-style),
+# so rolling statistics take O(1) time and memory per sample
+class RollingStat:
+    def __init__(self, alpha=0.05):
+        self.alpha = alpha
+        self.mean = 0.0
+        self.variance = 0.0
+        self.samples = 0
+
+    def add(self, value):
+        if self.samples == 0:
+            self.mean = value
+        else:
+            delta = value - self.mean
+            self.mean += self.alpha * delta
+            self.variance = (1 - self.alpha) * (self.variance + self.alpha * delta * delta)
+        self.samples += 1
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+# Thermodynamic observables measured from the simulation. The wall-collision code
+# adds momentum transfer to wall_impulse; record() turns it into pressure (force
+# per unit wall length, as the gas is 2D) and updates the rolling statistics.
+# Speeds are computed into a reused scratch buffer and the kinetic energy is reduced
+# straight from it, so recording makes no per-particle allocations.
+class GasObservables:
+    def __init__(self, alpha=0.05):
+        self.wall_impulse = np.zeros(4)  # left, right, top, bottom
+        self.pressure = RollingStat(alpha)
+        self.wall_pressure = [RollingStat(alpha) for _ in range(4)]
+        self.temperature = RollingStat(alpha)
+        self.mean_speed = RollingStat(alpha)
+        self.collision_rate = RollingStat(alpha)  # collisions per particle per second
+        self._speeds = np.empty(0)
+
+    def speeds(self, velocities):
+        count = len(velocities)
+        if len(self._speeds) < count:
+            self._speeds = np.empty(max(count, 2 * len(self._speeds)))
+        speeds = self._speeds[:count]
+        np.einsum("ij,ij->i", velocities, velocities, out=speeds)
+        np.sqrt(speeds, out=speeds)
+        return speeds
+
+    def record(self, velocities, masses, collisions, dt, width, height):
+        count = len(velocities)
+        speeds = self.speeds(velocities)
+        for wall, length in enumerate((height, height, width, width)):
+            self.wall_pressure[wall].add(self.wall_impulse[wall] / (dt * length))
+        self.pressure.add(self.wall_impulse.sum() / (dt * 2 * (width + height)))
+        self.wall_impulse[:] = 0
+        if count == 0:
+            return speeds
+        # 2D equipartition: total kinetic energy = N k T
+        self.temperature.add(np.einsum("i,i,i->", masses, speeds, speeds) / (2 * count * k_B))
+        self.mean_speed.add(speeds.sum() / count)
+        self.collision_rate.add(2 * collisions / (count * dt))
+        return speeds
+
+    # Mean distance travelled between particle collisions
+    @property
+    def mean_free_path(self):
+        if self.collision_rate.mean <= 0:
+            return np.inf
+        return self.mean_speed.mean / self.collision_rate.mean
+
+# The gas physics without any display. Importing this module or creating a
+# simulation opens no window; the GUI in main() is a front-end over step().
+class GasSimulation:
+    def __init__(self, num_particles=num_particles, temperature=temperature, width=width, height=height,
+                 species=single_gas, fractions=None, collision_mode=collision_mode, thermostat=thermostat,
+                 seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.temperature = temperature
+        self.width = width
+        self.height = height
+        self.species_table = species
+        self.fractions = fractions
+        self.collision_mode = collision_mode
+        self.thermostat = thermostat
+        self.particles = ParticleStore()
+        self.observables = GasObservables()
+        self.event_engine = None
+        self.speeds = np.empty(0)
+        self.tick = 0
+        self.set_particle_count(num_particles)
+
+    def set_particle_count(self, count):
+        if len(self.particles) < count:
+            self.particles.spawn(count - len(self.particles), self.width, self.height, self.temperature,
+                                 self.species_table, self.fractions, self.rng)
+            self.event_engine = None
+        elif len(self.particles) > count:
+            self.particles.truncate(count)
+            self.event_engine = None
+
+    def set_temperature(self, temperature):
+        self.temperature = temperature
+
+    # Change the container size and scatter the particles across it
+    def resize(self, width, height):
+        if (width, height) == (self.width, self.height):
+            return
+        self.width, self.height = width, height
+        count = len(self.particles)
+        self.particles.positions[:] = np.column_stack((self.rng.uniform(0, width, count),
+                                                       self.rng.uniform(0, height, count)))
+        self.event_engine = None
+
+    # Advance the gas by dt simulated seconds and update the observables. In
+    # "cells" mode the step is split into collision_substeps() substeps, and the
+    # cell list is built once per step: it keeps every pair within contact
+    # distance plus a skin of twice the largest move per step, so no pair can
+    # close from outside it to contact during the step. (A particle sped up by a
+    # collision mid-step can outrun the skin; that pair is found next step.)
+    def step(self, dt=time_step):
+        particles = self.particles
+        collisions = 0
+        if self.collision_mode == "events":
+            if self.event_engine is None:
+                self.event_engine = EventDrivenCollisions(particles.positions, particles.velocities, particles.radii,
+                                                          particles.masses, self.width, self.height,
+                                                          self.observables.wall_impulse)
+            collisions = self.event_engine.advance(dt)
+        else:
+            substeps = 1
+            if self.collision_mode == "cells" and len(particles):
+                substeps = collision_substeps(particles.velocities, particles.radii, dt)
+                # each substep moves a particle at most the smallest radius
+                skin = 2 * substeps * particles.radii.min()
+                pairs = find_close_pairs(particles.positions, 2 * particles.radii.max() + skin)
+            for _ in range(substeps):
+                particles.positions[:] += particles.velocities * (dt / substeps)
+                handle_wall_collisions(particles.positions, particles.velocities, self.width, self.height,
+                                       particles.masses, self.observables.wall_impulse)
+                if self.collision_mode == "cells" and len(particles):
+                    collisions += resolve_particle_collisions(particles.positions, particles.velocities,
+                                                              particles.radii, particles.masses, pairs)
+        self.apply_thermostat(dt)
+        self.speeds = self.observables.record(particles.velocities, particles.masses, collisions, dt,
+                                              self.width, self.height)
+        self.tick += 1
+        return collisions
+
+    def apply_thermostat(self, dt):
+        particles = self.particles
+        if self.thermostat == "rescale":
+            factor = rescale_thermostat(particles.velocities, particles.masses, self.temperature, dt)
+            if self.event_engine is not None and factor > 0:
+                self.event_engine.scale_velocities(factor)
+            elif self.event_engine is not None:
+                self.event_engine = None
+        elif self.thermostat == "andersen":
+            changed = andersen_thermostat(particles.velocities, particles.masses, self.temperature, dt, self.rng)
+            if self.event_engine is not None:
+                self.event_engine.velocities_changed(changed)
+
+    # Trajectory recording (see trajectory.py): one frame per step, with the
+    # species index as an extra column and the species table in the metadata
+    def open_recording(self, path, dt=time_step):
+        return TrajectoryWriter(path, extra_columns=("species",), simulation="gas_lab", dt=dt,
+                                species=[kind._asdict() for kind in self.species_table],
+                                collision_mode=self.collision_mode, thermostat=self.thermostat)
+
+    def record(self, writer):
+        particles = self.particles
+        writer.append(self.tick, particles.positions, particles.velocities, particles.species,
+                      width=self.width, height=self.height)
+
+# Function to run the simulation without a display and measure throughput
+def run_headless(steps, num_particles=num_particles, seed=None, collision_mode=collision_mode, dt=time_step,
+                 species=single_gas, thermostat=thermostat, width=width, height=height, record=None):
+    simulation = GasSimulation(num_particles, width=width, height=height, species=species,
+                               collision_mode=collision_mode, thermostat=thermostat, seed=seed)
+    writer = simulation.open_recording(record, dt) if record else None
+    start = time.perf_counter()
+    for _ in range(steps):
+        simulation.step(dt)
+        if writer:
+            simulation.record(writer)
+    elapsed = time.perf_counter() - start
+    if writer:
+        writer.close()
+    return {
+        "steps": steps,
+        "particles": num_particles,
+        "seconds": elapsed,
+        "particle_steps_per_second": steps * num_particles / elapsed if elapsed > 0 else float("inf"),
+        "pressure": simulation.observables.pressure.mean,
+        "temperature": simulation.observables.temperature.mean,
+    }
+
+# Interactive front-end: pygame window, pygame_gui sliders and side panel
+def main(mode=collision_mode, species=single_gas, thermostat_mode=thermostat, record=None):
+    import pygame_gui
+
+    simulation = GasSimulation(species=species, collision_mode=mode, thermostat=thermostat_mode)
+    writer = simulation.open_recording(record) if record else None
+
+    # Initialize pygame
+    pygame.init()
+    screen = pygame.display.set_mode((simulation.width + 300, simulation.height))  # Extra space for side panel
+    pygame.display.set_caption("Gas Lab Simulator")
+    font = pygame.font.SysFont(None, 24)
+    clock = pygame.time.Clock()
+
+    # Initialize pygame_gui
+    manager = pygame_gui.UIManager((simulation.width + 300, simulation.height))
+
+    # Side panel layout
+    panel_x = simulation.width + 10
+    panel_y = 10
+    slider_width = 280
+    slider_height = 20
+    label_height = 30
+
+    # Sliders for controlling particles, temperature, and container size
+    particle_slider = pygame_gui.elements.UIHorizontalSlider(
+        relative_rect=pygame.Rect((panel_x, panel_y + label_height), (slider_width, slider_height)),
+        start_value=len(simulation.particles),
+        value_range=(10, 500),
+        manager=manager
+    )
+
+    temperature_slider = pygame_gui.elements.UIHorizontalSlider(
+        relative_rect=pygame.Rect((panel_x, panel_y + 2 * label_height + slider_height), (slider_width, slider_height)),
+        start_value=simulation.temperature,
+        value_range=(100, 500),
+        manager=manager
+    )
+
+    width_slider = pygame_gui.elements.UIHorizontalSlider(
+        relative_rect=pygame.Rect((panel_x, panel_y + 3 * label_height + 2 * slider_height), (slider_width, slider_height)),
+        start_value=simulation.width,
+        value_range=(400, 1000),
+        manager=manager
+    )
+
+    height_slider = pygame_gui.elements.UIHorizontalSlider(
+        relative_rect=pygame.Rect((panel_x, panel_y + 4 * label_height + 3 * slider_height), (slider_width, slider_height)),
+        start_value=simulation.height,
+        value_range=(300, 800),
+        manager=manager
+    )
+
+    # Labels for sliders
+    pygame_gui.elements.UILabel(
+        relative_rect=pygame.Rect((panel_x, panel_y), (slider_width, label_height)),
+        text="Number of Particles",
+        manager=manager
+    )
+
+    pygame_gui.elements.UILabel(
+        relative_rect=pygame.Rect((panel_x, panel_y + label_height + slider_height), (slider_width, label_height)),
+        text="Temperature (K)",
+        manager=manager
+    )
+
+    pygame_gui.elements.UILabel(
+        relative_rect=pygame.Rect((panel_x, panel_y + 2 * (label_height + slider_height)), (slider_width, label_height)),
+        text="Container Width",
+        manager=manager
+    )
+
+    pygame_gui.elements.UILabel(
+        relative_rect=pygame.Rect((panel_x, panel_y + 3 * (label_height + slider_height)), (slider_width, label_height)),
+        text="Container Height",
+        manager=manager
+    )
+
+    particle_sprites = [make_particle_sprite(kind.radius, kind.color) for kind in species]
+
+    # Initialize histogram, with room for speeds of the lightest species well above the hottest slider setting
+    lightest = min(kind.mass for kind in species)
+    histogram = SpeedHistogram(font, 3 * np.sqrt(3 * k_B * 500 / lightest), species)
+    observables = simulation.observables
+
+    # Main simulation loop
+    running = True
+    while running:
+        time_delta = clock.tick(60) / 1000.0  # Time in seconds since last tick
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            manager.process_events(event)
+
+        # Update the simulation from the sliders
+        simulation.set_particle_count(int(particle_slider.get_current_value()))
+        simulation.set_temperature(int(temperature_slider.get_current_value()))
+        new_width = int(width_slider.get_current_value())
+        new_height = int(height_slider.get_current_value())
+        if new_width != simulation.width or new_height != simulation.height:
+            simulation.resize(new_width, new_height)
+            screen = pygame.display.set_mode((new_width + 300, new_height))
+        width, height = simulation.width, simulation.height
+
+        simulation.step(time_step)
+        if writer:
+            simulation.record(writer)
+
+        # Clear the screen
+        screen.fill((0, 0, 0))
+
+        # Draw simulation area border
+        pygame.draw.rect(screen, (255, 255, 255), (0, 0, width, height), 2)
+
+        # Draw particles
+        particles = simulation.particles
+        draw_particles(screen, particle_sprites, particles.positions, particles.radii, particles.species)
+
+        # Side panel for data
+        pygame.draw.rect(screen, (50, 50, 50), (width, 0, 300, height))  # Side panel background
+        screen.blit(font.render(f"Temperature: {simulation.temperature} K", True, (255, 255, 255)), (panel_x, panel_y))
+        screen.blit(font.render(f"Particles: {len(simulation.particles)}", True, (255, 255, 255)), (panel_x, panel_y + label_height + slider_height))
+        screen.blit(font.render(f"Pressure: {observables.pressure.mean:.2e} N/m", True, (255, 255, 255)), (panel_x, panel_y + 2 * (label_height + slider_height)))
+
+        # Update histogram
+        histogram.update(simulation.speeds, particles.species)
+        histogram_y = panel_y + 4 * (label_height + slider_height)
+        screen.blit(histogram.draw(simulation.temperature), (panel_x, histogram_y))
+
+        # Measured observables (rolling averages)
+        readouts = (
+            f"P = {observables.pressure.mean:.2e} +/- {observables.pressure.std:.1e} N/m",
+            f"T(kinetic) = {observables.temperature.mean:.0f} K",
+            f"Collisions = {observables.collision_rate.mean:.2f} /particle/s",
+            f"Mean free path = {observables.mean_free_path:.0f}",
+        )
+        for row, text in enumerate(readouts):
+            screen.blit(font.render(text, True, (255, 255, 255)), (panel_x, histogram_y + 285 + 20 * row))
+
+        manager.update(time_delta)
+        manager.draw_ui(screen)
+
+        pygame.display.flip()
+
+    if writer:
+        writer.close()
+    pygame.quit()
+
+# Play back a recording made with --record. Frames are read from the memory-mapped
+# file on demand, so scrubbing is O(1) per frame whatever the length of the run.
+# The slider scrubs, space pauses, left/right step one frame, home/end jump.
+def replay(path):
+    import pygame_gui
+
+    recording = TrajectoryReader(path)
+    if len(recording) == 0:
+        print(f"{path}: no frames recorded")
+        return
+    species = [Species(**kind) for kind in recording.meta["species"]]
+    masses = np.array([kind.mass for kind in species])
+    radii = np.array([kind.radius for kind in species], dtype=float)
+    last = len(recording) - 1
+
+    pygame.init()
+    box_width = int(recording.index["width"].max())
+    box_height = int(recording.index["height"].max())
+    screen = pygame.display.set_mode((box_width + 300, box_height))
+    pygame.display.set_caption(f"Gas Lab Replay - {path}")
+    font = pygame.font.SysFont(None, 24)
+    clock = pygame.time.Clock()
+    manager = pygame_gui.UIManager((box_width + 300, box_height))
+
+    panel_x = box_width + 10
+    panel_y = 10
+    frame_slider = pygame_gui.elements.UIHorizontalSlider(
+        relative_rect=pygame.Rect((panel_x, panel_y + 30), (280, 20)),
+        start_value=0,
+        value_range=(0, max(last, 1)),
+        manager=manager
+    )
+    particle_sprites = [make_particle_sprite(kind.radius, kind.color) for kind in species]
+    lightest = min(kind.mass for kind in species)
+    histogram = SpeedHistogram(font, 3 * np.sqrt(3 * k_B * 500 / lightest), species)
+
+    frame = 0
+    playing = True
+    running = True
+    while running:
+        time_delta = clock.tick(60) / 1000.0
+        moved = False
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                moved = True
+                if event.key == pygame.K_SPACE:
+                    playing = not playing
+                    moved = False
+                elif event.key == pygame.K_LEFT:
+                    frame, playing = frame - 1, False
+                elif event.key == pygame.K_RIGHT:
+                    frame, playing = frame + 1, False
+                elif event.key == pygame.K_HOME:
+                    frame = 0
+                elif event.key == pygame.K_END:
+                    frame = last
+                else:
+                    moved = False
+            elif event.type == pygame_gui.UI_HORIZONTAL_SLIDER_MOVED and event.ui_element == frame_slider:
+                frame, playing = int(event.value), False
+            manager.process_events(event)
+        if playing and frame < last:
+            frame += 1
+            moved = True
+        frame = min(max(frame, 0), last)
+        if moved:
+            frame_slider.set_current_value(frame)
+
+        kinds = recording.column(frame, "species").astype(np.int64)
+        positions = recording.positions(frame)
+        velocities = recording.velocities(frame)
+        count = len(kinds)
+        frame_width, frame_height = recording.box(frame)
+
+        screen.fill((0, 0, 0))
+        pygame.draw.rect(screen, (255, 255, 255), (0, 0, frame_width, frame_height), 2)
+        draw_particles(screen, particle_sprites, positions, radii[kinds], kinds)
+
+        pygame.draw.rect(screen, (50, 50, 50), (box_width, 0, 300, box_height))
+        speeds = np.hypot(velocities[:, 0], velocities[:, 1])
+        kinetic = np.dot(masses[kinds], speeds * speeds) / (2 * max(count, 1) * k_B)
+        screen.blit(font.render(f"Frame {frame} / {last}  (tick {recording.tick(frame)})", True, (255, 255, 255)),
+                    (panel_x, panel_y))
+        histogram.update(speeds, kinds)
+        histogram_y = panel_y + 60
+        screen.blit(histogram.draw(kinetic), (panel_x, histogram_y))
+        readouts = (
+            f"Particles = {count}",
+            f"T(kinetic) = {kinetic:.0f} K",
+            f"Box = {frame_width:.0f} x {frame_height:.0f}",
+            "Playing" if playing else "Paused (space to play)",
+        )
+        for row, text in enumerate(readouts):
+            screen.blit(font.render(text, True, (255, 255, 255)), (panel_x, histogram_y + 285 + 20 * row))
+
+        manager.update(time_delta)
+        manager.draw_ui(screen)
+        pygame.display.flip()
+
+    pygame.quit()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Gas lab simulator")
+    parser.add_argument("--headless", action="store_true", help="run without a display and report throughput")
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--particles", type=int, default=num_particles)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--mode", choices=("cells", "events", "off"), default=collision_mode)
+    parser.add_argument("--thermostat", choices=("rescale", "andersen", "none"), default=thermostat)
+    parser.add_argument("--mixture", action="store_true", help="simulate the light/heavy gas mixture")
+    parser.add_argument("--width", type=int, default=width)
+    parser.add_argument("--height", type=int, default=height)
+    parser.add_argument("--record", metavar="DIR", help="record every step to this trajectory directory")
+    parser.add_argument("--replay", metavar="DIR", help="play back a recorded trajectory instead of simulating")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.replay:
+        replay(args.replay)
+    elif args.headless:
+        result = run_headless(args.steps, args.particles, args.seed, args.mode,
+                              species=gas_mixture if args.mixture else single_gas, thermostat=args.thermostat,
+                              width=args.width, height=args.height, record=args.record)
+        print(f"{result['steps']} steps of {result['particles']} particles in {result['seconds']:.3f} s: "
+              f"{result['particle_steps_per_second']:.3e} particle-steps/s")
+        print(f"pressure {result['pressure']:.3e} N/m, kinetic temperature {result['temperature']:.1f} K")
+    else:
+        main(args.mode, gas_mixture if args.mixture else single_gas, args.thermostat, args.record)
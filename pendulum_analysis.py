@@ -0,0 +1,120 @@
+import time
+import argparse
+import numpy as np
+import matplotlib.pyplot as plt
+
+import Double_Pendulum_Visualizer as pendulum_module
+from Double_Pendulum_Visualizer import integrate, pendulum
+
+# Phase-space analysis of a double pendulum trajectory: t is the (N,) array of
+# sample times and y the (N, 4) array of (th1, w1, th2, w2) states, as returned
+# by integrate(). Every function works on whole arrays, so the cost per sample
+# is a few array operations and multi-million-sample runs take seconds. The
+# model is the DoublePendulum the trajectory was integrated with.
+
+analysis_t_stop = 500  # seconds simulated by the command-line analysis
+analysis_rtol = 1e-10
+
+
+def wrap(angle):
+    # angles mapped into [-pi, pi)
+    return (angle + np.pi) % (2 * np.pi) - np.pi
+
+
+# Poincare section th1 = 0 (mod 2 pi) crossed with w1 > 0. Crossings are found
+# between samples, then located by Newton iteration on the cubic Hermite
+# interpolant through the two samples and their derivatives, so the section
+# stays accurate with coarse sampling. f is the right-hand side, by default the
+# model's. Returns the crossing times (K,) and the states there (K, 4).
+def poincare_section(t, y, f=None, newton_steps=4, model=pendulum):
+    f = f or model.derivs
+    turns = np.floor(y[:, 0] / (2 * np.pi))
+    i = np.flatnonzero(turns[1:] > turns[:-1])
+    target = 2 * np.pi * turns[i + 1]
+    y0, y1 = y[i], y[i + 1]
+    h = (t[i + 1] - t[i])[:, None]
+    f0, f1 = h * f(t[i], y0), h * f(t[i + 1], y1)
+
+    s = np.clip((target - y0[:, 0]) / (y1[:, 0] - y0[:, 0]), 0, 1)
+    for _ in range(newton_steps):
+        value, slope = _hermite(y0[:, 0], f0[:, 0], y1[:, 0], f1[:, 0], s)
+        s = np.clip(s - (value - target) / slope, 0, 1)
+    states, _ = _hermite(y0, f0, y1, f1, s[:, None])
+    rising = states[:, 1] > 0
+    return (t[i] + s * h[:, 0])[rising], states[rising]
+
+
+def _hermite(y0, f0, y1, f1, s):
+    # cubic Hermite value and d/ds on [0, 1], with f0 and f1 already scaled by the step
+    s2 = s * s
+    s3 = s2 * s
+    value = (2*s3 - 3*s2 + 1) * y0 + (s3 - 2*s2 + s) * f0 + (3*s2 - 2*s3) * y1 + (s3 - s2) * f1
+    slope = (6*s2 - 6*s) * y0 + (3*s2 - 4*s + 1) * f0 + (6*s - 6*s2) * y1 + (3*s2 - 2*s) * f1
+    return value, slope
+
+
+# Total energy at every sample and its drift relative to the first sample
+def energy_history(y, model=pendulum):
+    e = model.energy(y)
+    return e, (e - e[0]) / abs(e[0])
+
+
+# One-sided power spectrum of th2 from uniformly spaced samples. The linear
+# trend (whole turns of a rotating arm) is removed and a Hann window applied
+# before the FFT. Returns (frequencies in Hz, power spectral density in rad^2/Hz).
+def power_spectrum(t, y, column=2):
+    slope, intercept = np.polyfit(t, y[:, column], 1)
+    signal = y[:, column] - (slope * t + intercept)
+    dt = t[1] - t[0]
+    window = np.hanning(len(signal))
+    spectrum = np.fft.rfft(signal * window)
+    density = np.abs(spectrum) ** 2 * dt / np.dot(window, window)
+    # every bin but DC, and Nyquist when the count is even, stands for +f and -f
+    density[1:len(density) - (len(signal) % 2 == 0)] *= 2
+    return np.fft.rfftfreq(len(signal), dt), density
+
+
+def plot_analysis(t, y, path=None, model=pendulum):
+    _, section = poincare_section(t, y, model=model)
+    e, drift = energy_history(y, model)
+    frequencies, density = power_spectrum(t, y)
+
+    fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=(15, 4.5))
+    ax1.plot(wrap(section[:, 2]), section[:, 3], '.', ms=2)
+    ax1.set_xlabel('theta2 (rad)')
+    ax1.set_ylabel('omega2 (rad/s)')
+    ax1.set_title(f'Poincare section theta1 = 0, omega1 > 0 ({len(section)} points)')
+    ax2.plot(t, drift)
+    ax2.set_xlabel('time (s)')
+    ax2.set_ylabel('(E - E0) / |E0|')
+    ax2.set_title(f'Energy, E0 = {e[0]:.4f} J')
+    ax3.semilogy(frequencies[1:], density[1:], lw=0.8)
+    ax3.set_xlabel('frequency (Hz)')
+    ax3.set_ylabel('PSD of theta2 (rad^2/Hz)')
+    ax3.set_title('Power spectrum of theta2')
+    fig.tight_layout()
+    if path:
+        fig.savefig(path, dpi=120)
+    else:
+        plt.show()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Double pendulum phase-space analysis")
+    parser.add_argument("--t-stop", type=float, default=analysis_t_stop)
+    parser.add_argument("--dt", type=float, default=pendulum_module.dt, help="sample spacing")
+    parser.add_argument("--rtol", type=float, default=analysis_rtol)
+    parser.add_argument("--output", metavar="FILE", help="save the figure instead of showing it")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    state = np.radians([pendulum_module.th1, pendulum_module.w1, pendulum_module.th2, pendulum_module.w2])
+    t = np.arange(0, args.t_stop, args.dt)
+    start = time.perf_counter()
+    y, stats = integrate(pendulum.derivs, t, state, "dopri5", args.dt, args.rtol)
+    print(f"integrated {len(t)} samples ({stats['steps']} steps) in {time.perf_counter() - start:.1f} s")
+    start = time.perf_counter()
+    plot_analysis(t, y, args.output)
+    print(f"analysed in {time.perf_counter() - start:.2f} s")
@@ -0,0 +1,106 @@
+import os
+import json
+import numpy as np
+
+# Trajectory recordings shared by the gas lab and the boid simulation.
+#
+# A recording is a directory holding
+#   frames.f32  every frame's (count, columns) float32 rows, appended back to back
+#   index.bin   one INDEX_DTYPE record per frame: where its rows start, how many
+#               there are, the simulation tick and the box size at that tick
+#   meta.json   the column names plus whatever the simulation needs to replay
+# Both binary files are append-only, so a run that is cut short stays readable
+# up to its last complete frame. The reader memory-maps them, which makes any
+# frame one slice away without loading the trajectory into memory.
+
+FRAMES_FILE = "frames.f32"
+INDEX_FILE = "index.bin"
+META_FILE = "meta.json"
+FRAME_DTYPE = np.float32
+INDEX_DTYPE = np.dtype([("offset", "<i8"), ("count", "<i8"), ("tick", "<i8"),
+                        ("width", "<f8"), ("height", "<f8")])
+BASE_COLUMNS = ("x", "y", "vx", "vy")
+
+class TrajectoryWriter:
+    # extra_columns name per-particle values stored after x, y, vx, vy (for
+    # example the species index); meta is written to meta.json as given
+    def __init__(self, path, extra_columns=(), **meta):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.columns = BASE_COLUMNS + tuple(extra_columns)
+        self.rows = 0
+        self.frames = 0
+        with open(os.path.join(path, META_FILE), "w") as file:
+            json.dump(dict(meta, columns=list(self.columns)), file, indent=2)
+        self._frames = open(os.path.join(path, FRAMES_FILE), "wb")
+        self._index = open(os.path.join(path, INDEX_FILE), "wb")
+        self._buffer = np.empty((0, len(self.columns)), FRAME_DTYPE)
+        self._record = np.zeros(1, INDEX_DTYPE)
+
+    # Append one frame. positions and velocities are (N, 2); extra holds one
+    # (N,) array per extra column. Rows are packed into a reused float32 buffer.
+    def append(self, tick, positions, velocities, *extra, width=0, height=0):
+        if len(extra) != len(self.columns) - len(BASE_COLUMNS):
+            raise ValueError(f"expected columns {self.columns}")
+        count = len(positions)
+        if len(self._buffer) < count:
+            self._buffer = np.empty((max(count, 2 * len(self._buffer)), len(self.columns)), FRAME_DTYPE)
+        frame = self._buffer[:count]
+        frame[:, 0:2] = positions
+        frame[:, 2:4] = velocities
+        for column, values in enumerate(extra, len(BASE_COLUMNS)):
+            frame[:, column] = values
+        self._frames.write(frame.data)
+        self._record[0] = (self.rows, count, tick, width, height)
+        self._index.write(self._record.data)
+        self.rows += count
+        self.frames += 1
+
+    def close(self):
+        self._frames.close()
+        self._index.close()
+
+def _map(path, dtype, shape=()):
+    # Read-only memory map of a whole file; np.memmap cannot map an empty one
+    itemsize = np.dtype(dtype).itemsize * int(np.prod(shape))
+    length = os.path.getsize(path) // itemsize if os.path.exists(path) else 0
+    if length == 0:
+        return np.empty((0,) + shape, dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(length,) + shape)
+
+class TrajectoryReader:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as file:
+            self.meta = json.load(file)
+        self.columns = tuple(self.meta["columns"])
+        self.data = _map(os.path.join(path, FRAMES_FILE), FRAME_DTYPE, (len(self.columns),))
+        index = _map(os.path.join(path, INDEX_FILE), INDEX_DTYPE)
+        # The two files are flushed independently, so an interrupted recording
+        # can index rows that never reached frames.f32: keep complete frames only
+        complete = index["offset"] + index["count"] <= len(self.data)
+        self.index = index[:len(index) if complete.all() else int(np.argmin(complete))]
+
+    def __len__(self):
+        return len(self.index)
+
+    # (count, columns) read-only view of frame k; no data is read until used
+    def frame(self, k):
+        record = self.index[k]
+        return self.data[record["offset"]:record["offset"] + record["count"]]
+
+    def positions(self, k):
+        return self.frame(k)[:, 0:2]
+
+    def velocities(self, k):
+        return self.frame(k)[:, 2:4]
+
+    def column(self, k, name):
+        return self.frame(k)[:, self.columns.index(name)]
+
+    def tick(self, k):
+        return int(self.index[k]["tick"])
+
+    def box(self, k):
+        record = self.index[k]
+        return float(record["width"]), float(record["height"])